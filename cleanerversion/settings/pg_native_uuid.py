@@ -0,0 +1,7 @@
+"""
+Django settings for testing the CleanerVersion project with native UUID fields on PostgreSQL.
+"""
+
+from .pg import *
+
+VERSIONED_NATIVE_UUID = True
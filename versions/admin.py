@@ -235,7 +235,7 @@ class VersionedAdmin(admin.ModelAdmin):
         opts = model._meta
         app_label = opts.app_label
         action_list = LogEntry.objects.filter(
-            object_id=unquote(obj.identity),  # this is the change for our override;
+            object_id=unquote(force_text(obj.identity)),  # this is the change for our override;
             content_type=get_content_type_for_model(model)
         ).select_related().order_by('action_time')
 
@@ -275,7 +275,7 @@ class VersionedAdmin(admin.ModelAdmin):
         """
         Shortens identity to the last 12 characters
         """
-        return "..." + obj.identity[-12:]
+        return "..." + force_text(obj.identity)[-12:]
 
     identity_shortener.boolean = False
     identity_shortener.short_description = "Short Identity"
@@ -0,0 +1,128 @@
+from django import VERSION
+from django.db import connections, router, transaction
+from django.db.models import F
+
+from versions.models import get_versioned_through_models, partition_table_name
+
+
+def archive_versions(model, cutoff, using=None, chunk_size=1000):
+    """
+    Moves the versions of a Versionable model that ended before the cutoff to the model's archive table, together
+    with the rows of the auto-created tables of the VersionedManyToManyFields of and to the model that ended before
+    the cutoff.  These rows are moved first, since they reference the versions of the model.
+    The archive tables are created if they do not exist yet.
+
+    The latest version of an object (whose id is the object's identity) stays in the model's table even if it has
+    ended, since this is the version referenced by the VersionedForeignKeys of other objects.  So do the versions
+    still referenced by any foreign key (e.g. a plain ForeignKey pointing a historic version), which would otherwise
+    point to a missing row.
+
+    The versions are moved in chunks, each in its own transaction, so that the tables stay usable meanwhile.  If the
+    archival is interrupted, running it again moves the remaining versions.
+
+    Once the model is listed in the VERSIONED_ARCHIVED_MODELS setting, queries for a point in time in the past
+    read the versions from both the model's table and its archive table, and so do the VersionManager's
+    next_version(s), previous_version(s) and history().  Other queries (e.g. those not restricted to a query time,
+    or field_changes()) only read the model's table.
+
+    :param model: Versionable model
+    :param datetime cutoff: versions ending before this point in time are archived
+    :param str using: database alias to use; if None, the router's write database for the model is used
+    :param int chunk_size: number of versions moved per transaction
+    :return: number of versions (and many-to-many relationship rows) archived
+    :rtype: int
+    """
+    if model._meta.parents:
+        raise ValueError("Models using multi-table inheritance can not be archived")
+    using = using or router.db_for_write(model)
+    archived = 0
+    for archived_model in get_versioned_through_models(model) + [model]:
+        versions = archived_model._base_manager.using(using).filter(version_end_date__lt=cutoff)
+        if archived_model is model:
+            versions = versions.exclude(id=F('identity'))
+        for field in _referencing_foreign_keys(archived_model):
+            referenced = field.model._base_manager.using(using).filter(**{'%s__isnull' % field.name: False})
+            versions = versions.exclude(**{'%s__in' % field.rel.get_related_field().name:
+                                           referenced.values_list(field.name, flat=True)})
+        archived += _archive(archived_model, versions, using, chunk_size)
+    return archived
+
+
+def _referencing_foreign_keys(model):
+    """
+    :return: the foreign keys of all models (including the auto-created models of many-to-many relationships)
+        pointing to the given model
+    """
+    if VERSION[:2] >= (1, 8):
+        relations = [f for f in model._meta.get_fields(include_hidden=True)
+                     if (f.one_to_many or f.one_to_one) and f.auto_created]
+    else:
+        relations = model._meta.get_all_related_objects(include_hidden=True)
+    return [relation.field for relation in relations]
+
+
+def create_archive_table(model, using=None):
+    """
+    Creates the archive table of a Versionable model, named <table>_archive, if it does not exist yet.  It has the
+    columns of the model's table and indexes on its primary key, on identity and version_start_date, and on
+    version_end_date.
+
+    :param model: Versionable model, or the auto-created model of a VersionedManyToManyField
+    :param str using: database alias to use; if None, the router's write database for the model is used
+    :return: whether the archive table has been created
+    :rtype: bool
+    """
+    connection = connections[using or router.db_for_write(model)]
+    qn = connection.ops.quote_name
+    archive = partition_table_name(model._meta.db_table, 'archive', connection)
+    cursor = connection.cursor()
+    try:
+        if archive in connection.introspection.table_names(cursor):
+            return False
+        with transaction.atomic(using=connection.alias):
+            fields = model._meta.local_concrete_fields
+            if connection.vendor == 'sqlite':
+                # Tables created from a SELECT do not get the declared column types on SQLite, which are needed to
+                # convert the values read from them before Django 1.8
+                cursor.execute('CREATE TABLE %s (%s)' % (
+                    qn(archive), ', '.join('%s %s' % (qn(f.column), f.db_type(connection)) for f in fields)))
+            else:
+                cursor.execute('CREATE TABLE %s AS SELECT %s FROM %s WHERE 1 = 0' % (
+                    qn(archive), ', '.join(qn(f.column) for f in fields), qn(model._meta.db_table)))
+            for suffix, unique, columns in (('pk', True, [model._meta.pk.column]),
+                                            ('temporal', False, ['identity', 'version_start_date']),
+                                            ('end', False, ['version_end_date'])):
+                cursor.execute('CREATE %sINDEX %s ON %s (%s)' % (
+                    'UNIQUE ' if unique else '', qn(partition_table_name(archive, suffix, connection)), qn(archive),
+                    ', '.join(qn(column) for column in columns)))
+    finally:
+        cursor.close()
+    return True
+
+
+def _archive(model, versions, using, chunk_size):
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    create_archive_table(model, using)
+    table = qn(model._meta.db_table)
+    archive = qn(partition_table_name(model._meta.db_table, 'archive', connection))
+    columns = ', '.join(qn(f.column) for f in model._meta.local_concrete_fields)
+    pk = qn(model._meta.pk.column)
+    chunk = versions.order_by('pk').values_list('pk')[:chunk_size]
+    chunk_sql, params = chunk.query.get_compiler(connection=connection).as_sql()
+
+    archived = 0
+    while True:
+        with transaction.atomic(using=using):
+            cursor = connection.cursor()
+            try:
+                # Both statements select the same chunk, since archived versions do not change anymore
+                cursor.execute('INSERT INTO %s (%s) SELECT %s FROM %s WHERE %s IN (%s)' % (
+                    archive, columns, columns, table, pk, chunk_sql), params)
+                moved = cursor.rowcount
+                if not moved:
+                    return archived
+                cursor.execute('DELETE FROM %s WHERE %s IN (%s)' % (table, pk, chunk_sql), params)
+                archived += moved
+            finally:
+                cursor.close()
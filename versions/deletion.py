@@ -4,7 +4,9 @@ from django.db.models.deletion import (
     CASCADE,
     Collector,
 )
+from django.db.models.sql.constants import GET_ITERATOR_CHUNK_SIZE
 import versions.models
+from versions.exceptions import DeletionOfNonCurrentVersionError
 
 
 class VersionedCollector(Collector):
@@ -23,6 +25,9 @@ class VersionedCollector(Collector):
     versionable_post_delete(), and in your settings file specify the dotted path
     to your custom class as a string, e.g.:
     VERSIONED_DELETE_COLLECTOR_CLASS = 'myapp.deletion.CustomVersionedCollector'
+
+    As long as versionable_delete() is not overridden, Versionable objects are soft-deleted
+    in batches, using one UPDATE statement per model and chunk of objects.
     """
 
     def can_fast_delete(self, objs, from_field=None):
@@ -32,6 +37,19 @@ class VersionedCollector(Collector):
     def is_versionable(self, model):
         return hasattr(model, 'VERSION_IDENTIFIER_FIELD') and hasattr(model, 'OBJECT_IDENTIFIER_FIELD')
 
+    def is_cascading(self, field):
+        return isinstance(field, versions.models.VersionedForeignKey) and field.rel.on_delete == CASCADE
+
+    def is_overridden(self, method_name):
+        """
+        Checks whether the given method of VersionedCollector has been overridden by a subclass.
+
+        :param str method_name:
+        :return: boolean
+        """
+        return six.get_unbound_function(getattr(self.__class__, method_name)) is not \
+            six.get_unbound_function(getattr(VersionedCollector, method_name))
+
     def delete(self, timestamp):
         # sort instance collections
         for model, instances in self.data.items():
@@ -42,13 +60,25 @@ class VersionedCollector(Collector):
         # end of a transaction.
         self.sort()
 
+        has_pre_delete = self.is_overridden('versionable_pre_delete')
+        has_post_delete = self.is_overridden('versionable_post_delete')
+        delete_in_batches = not self.is_overridden('versionable_delete')
+
+        if delete_in_batches:
+            # Check before changing anything, so that the error does not break the surrounding transaction
+            for model, instances in six.iteritems(self.data):
+                if self.is_versionable(model) and any(instance.version_end_date is not None
+                                                      for instance in instances):
+                    raise DeletionOfNonCurrentVersionError('Cannot delete anything else but the current version')
+
         with transaction.atomic(using=self.using, savepoint=False):
             # send pre_delete signals, but not for versionables
             for model, obj in self.instances_with_model():
                 if not model._meta.auto_created:
                     if self.is_versionable(model):
                         # By default, no signal is sent when deleting a Versionable.
-                        self.versionable_pre_delete(obj, timestamp)
+                        if has_pre_delete:
+                            self.versionable_pre_delete(obj, timestamp)
                     else:
                         signals.pre_delete.send(
                             sender=model, instance=obj, using=self.using
@@ -61,22 +91,21 @@ class VersionedCollector(Collector):
             # update fields
             for model, instances_for_fieldvalues in six.iteritems(self.field_updates):
                 id_map = {}
-                for (field, value), instances in six.iteritems(instances_for_fieldvalues):
-                    if self.is_versionable(model):
-                        # Do not set the foreign key to null, which can be the behaviour (depending on DB backend)
-                        # for the default CASCADE on_delete method.
-                        # In the case of a SET.. method, clone before changing the value (if it hasn't already been
-                        # cloned)
+                if self.is_versionable(model):
+                    # Do not set the foreign key to null, which can be the behaviour (depending on DB backend)
+                    # for the default CASCADE on_delete method.
+                    # In the case of a SET.. method, clone before changing the value. All instances of the model
+                    # are cloned at once, each of them only a single time.
+                    pk_set = set()
+                    for (field, value), instances in six.iteritems(instances_for_fieldvalues):
+                        if not self.is_cascading(field):
+                            pk_set.update(instance.pk for instance in instances)
+                    id_map = self.versionable_clone_batch(model, pk_set, timestamp)
+
+                    for (field, value), instances in six.iteritems(instances_for_fieldvalues):
                         updated_instances = set()
-                        if not(isinstance(field, versions.models.VersionedForeignKey) and field.rel.on_delete == CASCADE):
-                            for instance in instances:
-                                # Clone before updating
-                                cloned = id_map.get(instance.pk, None)
-                                if not cloned:
-                                    cloned = instance.clone()
-                                id_map[instance.pk] = cloned
-                                updated_instances.add(cloned)
-                                #TODO: instance should get updated with new values from clone ?
+                        if not self.is_cascading(field):
+                            updated_instances = {id_map[instance.pk] for instance in instances}
                         instances_for_fieldvalues[(field, value)] = updated_instances
 
                 # Replace the instances with their clones in self.data, too
@@ -98,9 +127,12 @@ class VersionedCollector(Collector):
             # delete instances
             for model, instances in six.iteritems(self.data):
                 if self.is_versionable(model):
+                    if delete_in_batches:
+                        self.versionable_delete_batch(model, instances, timestamp)
                     for instance in instances:
-                        self.versionable_delete(instance, timestamp)
-                        if not model._meta.auto_created:
+                        if not delete_in_batches:
+                            self.versionable_delete(instance, timestamp)
+                        if has_post_delete and not model._meta.auto_created:
                             # By default, no signal is sent when deleting a Versionable.
                             self.versionable_post_delete(instance, timestamp)
                 else:
@@ -174,3 +206,47 @@ class VersionedCollector(Collector):
         :param datetime timestamp:
         """
         instance._delete_at(timestamp, using=self.using)
+
+    def versionable_delete_batch(self, model, instances, timestamp):
+        """
+        Soft-deletes all the given instances of a model at once, setting their version_end_date to timestamp.
+        This is the batched equivalent of versionable_delete(), used as long as the latter is not overridden.
+
+        :param model: Versionable subclass
+        :param list instances: instances of model
+        :param datetime timestamp:
+        """
+        manager = model._base_manager.using(self.using)
+        for offset in range(0, len(instances), GET_ITERATOR_CHUNK_SIZE):
+            batch = instances[offset:offset + GET_ITERATOR_CHUNK_SIZE]
+            manager.filter(pk__in=[instance.pk for instance in batch],
+                           version_end_date__isnull=True).update(version_end_date=timestamp)
+            for instance in batch:
+                instance.version_end_date = timestamp
+
+    def versionable_clone_batch(self, model, pk_list, timestamp):
+        """
+        Clones all the current versions of the given model having one of the given primary keys at once,
+        using timestamp as their version date. The clones keep the primary keys of the cloned objects.
+        Models using multi-table inheritance, which can not be created in bulk, are cloned one by one.
+
+        :param model: Versionable subclass
+        :param pk_list: primary keys of the objects to be cloned
+        :param datetime timestamp:
+        :return: a dict mapping the primary keys to the clones
+        :rtype: dict
+        :raises ValueError: if one of the objects is not a current version
+        """
+        pk_list = list(pk_list)
+        manager = model._base_manager.using(self.using)
+        id_map = {}
+        for offset in range(0, len(pk_list), GET_ITERATOR_CHUNK_SIZE):
+            chunk = manager.filter(pk__in=pk_list[offset:offset + GET_ITERATOR_CHUNK_SIZE])
+            if model._meta.parents:
+                clones = [instance.clone(forced_version_date=timestamp) for instance in chunk]
+            else:
+                clones = chunk._clone_all_at(timestamp)
+            id_map.update((clone.pk, clone) for clone in clones)
+        if len(id_map) < len(pk_list):
+            raise ValueError('This is a historical item and can not be cloned.')
+        return id_map
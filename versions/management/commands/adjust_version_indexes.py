@@ -0,0 +1,54 @@
+from optparse import make_option
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from versions.util.postgresql import apply_index_plan, plan_index_adjustments
+
+
+class Command(BaseCommand):
+    help = ("Removes the like indexes on the UUID columns and creates the version-unique and temporal indexes of the "
+            "Versionable models of the given applications (PostgreSQL only). The indexes are built concurrently, so "
+            "that the tables stay writable.")
+    args = '<app_label app_label ...>'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--database', action='store', dest='database', default=DEFAULT_DB_ALIAS,
+                    help='Nominates a database to adjust the indexes of. Defaults to the "default" database.'),
+        make_option('--dry-run', action='store_true', dest='dry_run', default=False,
+                    help='Only prints the statements that would be executed.'),
+        make_option('--no-concurrently', action='store_false', dest='concurrently', default=True,
+                    help='Creates and drops the indexes in the regular way, locking out writes to the tables.'),
+    )
+
+    def handle(self, *app_labels, **options):
+        database = options.get('database')
+        connection = connections[database]
+        if connection.vendor != 'postgresql':
+            raise CommandError("Index adjustments are only supported on PostgreSQL")
+        if not app_labels:
+            raise CommandError("Enter at least one application label")
+
+        plan = []
+        for app_label in app_labels:
+            plan.extend(plan_index_adjustments(app_label, database))
+        if not plan:
+            self.stdout.write("No index adjustments needed")
+            return
+
+        if options.get('dry_run'):
+            for change in plan:
+                self.stdout.write("%s;" % change.sql(connection, options.get('concurrently')))
+            return
+
+        started = [time.time()]
+
+        def progress(number, total, change):
+            if number > 1:
+                self.stdout.write("  done in %.1fs" % (time.time() - started[0]))
+            self.stdout.write("[%s/%s] %s" % (number, total, change.sql(connection, options.get('concurrently'))))
+            started[0] = time.time()
+
+        apply_index_plan(plan, database, concurrently=options.get('concurrently'), progress=progress)
+        self.stdout.write("  done in %.1fs" % (time.time() - started[0]))
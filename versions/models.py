@@ -14,34 +14,41 @@
 
 import copy
 import datetime
+import itertools
 import uuid
 from collections import namedtuple
 import re
+import warnings
 
 from django import VERSION
 
 if VERSION[:2] >= (1, 8):
+    from django.db.models import Case, When, Value
     from django.db.models.sql.datastructures import Join
 if VERSION[:2] >= (1, 7):
     from django.apps.registry import apps
-from django.core.exceptions import SuspiciousOperation, ObjectDoesNotExist
-from django.db import transaction
+    from django.db.backends.utils import truncate_name
+else:
+    from django.db.backends.util import truncate_name
+from django.core.exceptions import ImproperlyConfigured, SuspiciousOperation, ObjectDoesNotExist
+from django.db import DatabaseError, transaction
 from django.db.models.base import Model
 from django.db.models import Q
+from django.db.models.constants import LOOKUP_SEP
 from django.db.models.fields import FieldDoesNotExist
 from django.db.models.fields.related import (ForeignKey, ReverseSingleRelatedObjectDescriptor,
                                              ReverseManyRelatedObjectsDescriptor, ManyToManyField,
                                              ManyRelatedObjectsDescriptor, create_many_related_manager,
                                              ForeignRelatedObjectsDescriptor, RECURSIVE_RELATIONSHIP_CONSTANT)
 from django.db.models.query import QuerySet, ValuesListQuerySet, ValuesQuerySet
-from django.db.models.signals import post_init
-from django.db.models.sql import Query
-from django.db.models.sql.where import ExtraWhere, WhereNode
+from django.db.models.sql import Query, UpdateQuery
+from django.db.models.sql.constants import GET_ITERATOR_CHUNK_SIZE
+from django.db.models.sql.where import AND, ExtraWhere, WhereNode
 from django.utils.functional import cached_property
 from django.utils.timezone import utc, is_aware, make_aware
 from django.utils import six
 
-from django.db import models, router
+from django.db import models, router, connections
 
 from versions import settings as versions_settings
 from versions.exceptions import DeletionOfNonCurrentVersionError
@@ -53,11 +60,273 @@ def get_utc_now():
 
 QueryTime = namedtuple('QueryTime', 'time active')
 
+FieldChange = namedtuple('FieldChange', 'identity field old_value new_value timestamp')
+"""A change of a field's value between two consecutive versions, as returned by VersionedQuerySet.field_changes()"""
+
 
 class ForeignKeyRequiresValueError(ValueError):
     pass
 
 
+def uuid_field(**kwargs):
+    """
+    Creates the field used for storing the id and identity of Versionables.
+
+    By default, UUIDs are stored as 36 character strings. If the VERSIONED_NATIVE_UUID setting is enabled,
+    a UUIDField is used instead, which is stored in the database's native uuid type where available (e.g.
+    PostgreSQL). The (Versioned)ForeignKey columns pointing Versionables follow the type of these fields.
+
+    :param kwargs: arguments for the field's constructor
+    :return: models.Field
+    """
+    if versions_settings.get_setting('VERSIONED_NATIVE_UUID'):
+        if VERSION[:2] < (1, 8):
+            raise ImproperlyConfigured("VERSIONED_NATIVE_UUID requires Django 1.8 or later")
+        return models.UUIDField(**kwargs)
+    return models.CharField(max_length=36, **kwargs)
+
+
+def partition_table_name(table, partition, connection):
+    """
+    Returns the name of a partition of a Versionable model's table (see versions.util.postgresql.partition_versions),
+    or of its archive table (see versions.archive).
+
+    :param str table: the model's table name
+    :param str partition: 'current', 'historic' or 'archive'
+    :param connection: database connection
+    :return: str
+    """
+    return truncate_name('%s_%s' % (table, partition), connection.ops.max_name_length())
+
+
+def get_current_partitions(connection):
+    """
+    Gets the current partitions of the Versionable models listed in the VERSIONED_PARTITIONED_MODELS setting.
+    Queries for the current versions of these models read their current partition instead of the whole table.
+
+    :param connection: database connection
+    :return: dict mapping the models' table names to the table names of their current partitions
+    """
+    partitions = {}
+    for label in versions_settings.get_setting('VERSIONED_PARTITIONED_MODELS'):
+        model = _get_model(label)
+        partitions[model._meta.db_table] = partition_table_name(model._meta.db_table, 'current', connection)
+    return partitions
+
+
+def get_versioned_through_models(model):
+    """
+    Gets the auto-created models of the VersionedManyToManyFields of a Versionable model, and of the
+    VersionedManyToManyFields of other models pointing to it.
+
+    :param model: Versionable model
+    :return: list of models
+    """
+    fields = [field for field in model._meta.local_many_to_many if isinstance(field, VersionedManyToManyField)]
+    fields.extend(descriptor.related.field for descriptor in getattr(model._meta, 'many_to_many_related', []))
+    through_models = []
+    for field in fields:
+        through = field.rel.through
+        if through._meta.auto_created and through not in through_models:
+            through_models.append(through)
+    return through_models
+
+
+def get_archived_models():
+    """
+    Gets the Versionable models listed in the VERSIONED_ARCHIVED_MODELS setting, together with the auto-created
+    models of the VersionedManyToManyFields of and to them, whose versions are archived with them (see
+    versions.archive).
+
+    :return: list of models
+    """
+    return _get_models_with_through_models('VERSIONED_ARCHIVED_MODELS')
+
+
+def get_validity_range_models():
+    """
+    Gets the Versionable models listed in the VERSIONED_VALIDITY_RANGE_MODELS setting, together with the
+    auto-created models of the VersionedManyToManyFields of and to them, whose tables have a version_validity
+    column (see versions.util.postgresql.add_validity_ranges).
+
+    :return: list of models
+    """
+    return _get_models_with_through_models('VERSIONED_VALIDITY_RANGE_MODELS')
+
+
+def _get_models_with_through_models(setting):
+    listed_models = []
+    for label in versions_settings.get_setting(setting):
+        model = _get_model(label)
+        for listed_model in [model] + get_versioned_through_models(model):
+            if listed_model not in listed_models:
+                listed_models.append(listed_model)
+    return listed_models
+
+
+def get_archive_unions(connection):
+    """
+    Gets the tables to be read instead of the tables of archived models for queries with a query time in the past:
+    the union of the versions in the model's table and in its archive table.  The query time restrictions are
+    applied to both tables by the database.
+
+    If validity ranges are used (see use_validity_range), the unions have a version_validity column, too.  The
+    archive tables have none; it is computed from the version dates of the archived versions.
+
+    :param connection: database connection
+    :return: dict mapping the models' table names to the SQL of the unions
+    """
+    qn = connection.ops.quote_name
+    unions = {}
+    for model in get_archived_models():
+        table = model._meta.db_table
+        columns = archive_columns = ', '.join(qn(f.column) for f in model._meta.local_concrete_fields)
+        if use_validity_range(connection, table):
+            columns += ', version_validity'
+            archive_columns += ", tstzrange(version_start_date, version_end_date, '[)') AS version_validity"
+        unions[table] = '(SELECT {columns} FROM {table} UNION ALL SELECT {archive_columns} FROM {archive})'.format(
+            columns=columns, archive_columns=archive_columns,
+            table=qn(table), archive=qn(partition_table_name(table, 'archive', connection)))
+    return unions
+
+
+def _get_model(label):
+    if VERSION[:2] >= (1, 7):
+        return apps.get_model(label)
+    return models.get_model(*label.split('.'))
+
+
+VALIDITY_RANGE_SQL = '{alias}.version_validity @> %s::timestamptz'
+"""Restriction to the versions valid at a point in time, using the validity range column"""
+
+
+def use_validity_range(connection, table):
+    """
+    Checks whether query time restrictions to a point in time on the given table use the version_validity range
+    column (see versions.util.postgresql.add_validity_ranges) rather than the version_start_date and
+    version_end_date columns.
+
+    :param connection: database connection
+    :param str table: table name
+    :return: bool
+    """
+    return connection.vendor == 'postgresql' \
+        and any(model._meta.db_table == table for model in get_validity_range_models())
+
+
+def prefetch_versioned_objects(instances, lookups, using=None):
+    """
+    Populates the VersionedForeignKey caches of the given instances, such that accessing the relations returns the
+    related objects in the version valid at each instance's query time without querying the database.
+
+    For every step of every lookup, one query per distinct query time among the instances is run. It fetches the
+    versions the foreign keys point to (for finding their identities) together with the versions valid at the query
+    time.
+
+    :param instances: list of model instances having the same type
+    :param lookups: list of VersionedForeignKey names, possibly spanning relations (e.g. 'team__city')
+    :param str using: database alias to use
+    """
+    for lookup in lookups:
+        level = instances
+        for name in lookup.split(LOOKUP_SEP):
+            if not level:
+                break
+            level = _prefetch_versioned_relation(level, name, using)
+
+
+def _prefetch_versioned_relation(instances, name, using):
+    """
+    Populates the cache of the VersionedForeignKey with the given name on the instances.
+
+    :return: list of the distinct related objects
+    """
+    field = instances[0]._meta.get_field(name)
+    if not isinstance(field, VersionedForeignKey):
+        raise ValueError("'%s' is not a VersionedForeignKey of %s and can not be prefetched with prefetch_versioned()"
+                         % (name, instances[0]._meta.object_name))
+    cache_name = field.get_cache_name()
+    current_time = QueryTime(time=None, active=True)
+
+    related_objects = {}
+    instances_by_querytime = {}
+    for instance in instances:
+        if hasattr(instance, cache_name):
+            related = getattr(instance, cache_name)
+            if related is not None:
+                related_objects[id(related)] = related
+        elif getattr(instance, field.attname) is not None:
+            querytime = getattr(instance, '_querytime', current_time)
+            instances_by_querytime.setdefault(querytime, []).append(instance)
+
+    for querytime, group in instances_by_querytime.items():
+        pks = set(getattr(instance, field.attname) for instance in group)
+        queryset = field.rel.to._default_manager.using(using)
+        if not querytime.active:
+            # Any version satisfies an inactive query time, so the referenced versions themselves are used
+            referenced_versions = dict((obj.pk, obj) for obj in queryset.filter(pk__in=pks))
+        else:
+            if querytime.time is None:
+                valid_q = Q(version_end_date__isnull=True)
+            else:
+                valid_q = ((Q(version_end_date__gt=querytime.time) | Q(version_end_date__isnull=True))
+                           & Q(version_start_date__lte=querytime.time))
+            identities = queryset.filter(pk__in=pks).values('identity')
+            referenced_identities = {}
+            valid_versions = {}
+            for obj in queryset.filter(Q(pk__in=pks) | (Q(identity__in=identities) & valid_q)):
+                if obj.pk in pks:
+                    referenced_identities[obj.pk] = obj.identity
+                if Versionable.matches_querytime(obj, querytime):
+                    valid_versions[obj.identity] = obj
+            referenced_versions = dict((pk, valid_versions.get(identity))
+                                       for pk, identity in referenced_identities.items())
+
+        for instance in group:
+            related = referenced_versions.get(getattr(instance, field.attname))
+            if related is not None:
+                # Instances without a version valid at their query time are left to the descriptor, which raises
+                # the appropriate DoesNotExist exception
+                related._querytime = querytime
+                setattr(instance, cache_name, related)
+                related_objects[id(related)] = related
+
+    return list(related_objects.values())
+
+
+def supports_window_functions(connection):
+    """
+    Checks whether the database supports window functions (like LEAD() and LAG()).
+
+    :param connection: database connection
+    :return: bool
+    """
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 25, 0)
+    return False
+
+
+def _group_by_querytime(instances):
+    """
+    Groups the given instances by their query time, keeping the order in which the query times first appear.
+
+    :param instances: list of model instances
+    :return: list of (QueryTime, list of instances) tuples
+    """
+    current_time = QueryTime(time=None, active=True)
+    groups = []
+    group_indexes = {}
+    for instance in instances:
+        querytime = getattr(instance, '_querytime', current_time)
+        if querytime not in group_indexes:
+            group_indexes[querytime] = len(groups)
+            groups.append((querytime, []))
+        groups[group_indexes[querytime]][1].append(instance)
+    return groups
+
+
 class VersionManager(models.Manager):
     """
     This is the Manager-class for any class that inherits from Versionable
@@ -88,6 +357,42 @@ class VersionManager(models.Manager):
         """
         return self.get_queryset().as_of(time)
 
+    def prefetch_versioned(self, *lookups):
+        """
+        Prefetches the objects referenced by VersionedForeignKeys in their versions valid at the query time.
+        See VersionedQuerySet.prefetch_versioned() for details.
+        :param lookups: names of VersionedForeignKey fields, possibly spanning relations (e.g. 'team__city')
+        :return: A VersionedQuerySet
+        """
+        return self.get_queryset().prefetch_versioned(*lookups)
+
+    def field_changes(self, *fields):
+        """
+        Returns the changes of the given fields between consecutive versions.
+        See VersionedQuerySet.field_changes() for details.
+        :param fields: names of the fields whose changes are returned; all fields if none are given
+        :return: iterator of FieldChange tuples
+        """
+        return self.get_queryset().field_changes(*fields)
+
+    def snapshot(self, snapshot):
+        """
+        Returns a read-only QuerySet reading the objects from the given snapshot's tables.
+        See versions.snapshots.Snapshot for details.
+        :param versions.snapshots.Snapshot snapshot: a snapshot including this manager's model
+        :return: versions.snapshots.SnapshotQuerySet
+        """
+        return snapshot.queryset(self.model, using=self._db)
+
+    def stream(self, chunk_size=2000):
+        """
+        Iterates over all objects using a constant amount of memory.
+        See VersionedQuerySet.stream() for details.
+        :param int chunk_size: number of objects loaded per query
+        :return: iterator over the objects
+        """
+        return self.get_queryset().stream(chunk_size)
+
     def next_version(self, object, relations_as_of='end'):
         """
         Return the next version of the given object.
@@ -110,7 +415,7 @@ class VersionManager(models.Manager):
         if object.version_end_date == None:
             next = object
         else:
-            next = self.filter(
+            next = self.get_queryset()._including_archives().filter(
                 Q(identity=object.identity),
                 Q(version_start_date__gte=object.version_end_date)
             ).order_by('version_start_date').first()
@@ -139,7 +444,7 @@ class VersionManager(models.Manager):
         if object.version_birth_date == object.version_start_date:
             previous = object
         else:
-            previous = self.filter(
+            previous = self.get_queryset()._including_archives().filter(
                 Q(identity=object.identity),
                 Q(version_end_date__lte=object.version_start_date)
             ).order_by('-version_end_date').first()
@@ -178,6 +483,185 @@ class VersionManager(models.Manager):
 
         return self.adjust_version_as_of(current, relations_as_of)
 
+    def next_versions(self, objects, relations_as_of='end'):
+        """
+        Return the next version of each of the given objects, in the same order.
+
+        This is the batched counterpart of ``next_version``: the next versions of all objects that are not current
+        are looked up at once, using a window function where the database supports it.
+
+        :param list objects: Versionables whose next versions will be returned.
+        :param mixed relations_as_of: determines point in time used to access relations. 'start'|'end'|datetime|None
+        :return: list of Versionables
+        """
+        neighbours = self._neighbour_versions([o for o in objects if o.version_end_date is not None], 'next')
+        versions = []
+        for object in objects:
+            if object.version_end_date is None:
+                next = object
+            else:
+                next = neighbours.get(object.pk)
+                if not next:
+                    raise ObjectDoesNotExist(
+                        "next_versions couldn't find a next version of object " + str(object.identity))
+            versions.append(self.adjust_version_as_of(next, relations_as_of))
+        return versions
+
+    def previous_versions(self, objects, relations_as_of='end'):
+        """
+        Return the previous version of each of the given objects, in the same order.
+
+        This is the batched counterpart of ``previous_version``: the previous versions of all objects that are not
+        the first version are looked up at once, using a window function where the database supports it.
+
+        :param list objects: Versionables whose previous versions will be returned.
+        :param mixed relations_as_of: determines point in time used to access relations. 'start'|'end'|datetime|None
+        :return: list of Versionables
+        """
+        neighbours = self._neighbour_versions(
+            [o for o in objects if o.version_birth_date != o.version_start_date], 'previous')
+        versions = []
+        for object in objects:
+            if object.version_birth_date == object.version_start_date:
+                previous = object
+            else:
+                previous = neighbours.get(object.pk)
+                if not previous:
+                    raise ObjectDoesNotExist(
+                        "previous_versions couldn't find a previous version of object " + str(object.identity))
+            versions.append(self.adjust_version_as_of(previous, relations_as_of))
+        return versions
+
+    def current_versions(self, objects, relations_as_of=None, check_db=False):
+        """
+        Return the current version of each of the given objects, in the same order (None for objects that have been
+        deleted).
+
+        This is the batched counterpart of ``current_version``: the current versions are looked up using a
+        single query per chunk of objects.
+
+        :param list objects: Versionables whose current versions will be returned.
+        :param mixed relations_as_of: determines point in time used to access relations. 'start'|'end'|datetime|None
+        :param bool check_db: Whether or not to look in the database for a more recent version
+        :return: list of Versionables
+        """
+        identities = list(set(o.identity for o in objects if o.version_end_date is not None or check_db))
+        current = {}
+        for i in range(0, len(identities), GET_ITERATOR_CHUNK_SIZE):
+            for version in self.current.filter(identity__in=identities[i:i + GET_ITERATOR_CHUNK_SIZE]):
+                current[version.identity] = version
+        versions = []
+        for object in objects:
+            if object.version_end_date is None and not check_db:
+                version = object
+            else:
+                version = current.get(object.identity)
+            versions.append(self.adjust_version_as_of(version, relations_as_of))
+        return versions
+
+    def history(self, identities, start=None, end=None, relations_as_of='end'):
+        """
+        Return all versions of the objects with the given identities, grouped by identity.
+
+        The versions are fetched using a single query per batch of identities, ordered by identity and
+        version_start_date, and are streamed from the database (the results are not cached).
+        ``relations_as_of`` is applied to every version, see ``VersionManager.adjust_version_as_of`` for details.
+
+        :param identities: iterable of identities
+        :param datetime start: if given, only versions valid at or after this point in time are returned
+        :param datetime end: if given, only versions valid before this point in time are returned
+        :param mixed relations_as_of: determines point in time used to access relations. 'start'|'end'|datetime|None
+        :return: iterator of (identity, list of Versionables ordered by version_start_date) tuples, for every identity
+            having versions in the given time window
+        """
+        identities = sorted(set(identities), key=six.text_type)
+        if not identities:
+            return
+        queryset = self.get_queryset()._including_archives()
+        if start is not None:
+            queryset = queryset.filter(Q(version_end_date__gt=start) | Q(version_end_date__isnull=True))
+        if end is not None:
+            queryset = queryset.filter(version_start_date__lt=end)
+        batch_size = max(connections[self.db].ops.bulk_batch_size(['identity'], identities), 1)
+        for i in range(0, len(identities), batch_size):
+            versions = queryset.filter(identity__in=identities[i:i + batch_size]) \
+                .order_by('identity', 'version_start_date').iterator()
+            for identity, group in itertools.groupby(versions, key=lambda version: version.identity):
+                yield identity, [self.adjust_version_as_of(version, relations_as_of) for version in group]
+
+    def _neighbour_versions(self, objects, direction):
+        """
+        Looks up the versions following (direction 'next') or preceding (direction 'previous') the given objects.
+
+        Where the database supports window functions, LEAD() or LAG() over the versions of each identity, ordered by
+        version_start_date, is used. Elsewhere, all versions of the objects' identities are fetched and the neighbours
+        are determined in Python. Either way, a single query is made per batch of objects.
+
+        :param list objects: Versionables
+        :param str direction: 'next' or 'previous'
+        :return: dict mapping the objects' pks to the neighbouring versions
+        """
+        if not objects:
+            return {}
+        connection = connections[self.db]
+        use_window = supports_window_functions(connection) and not self.model._meta.parents
+        batch_size = max(connection.ops.bulk_batch_size([self.model._meta.pk.name], objects), 1)
+        neighbours = {}
+        for i in range(0, len(objects), batch_size):
+            chunk = objects[i:i + batch_size]
+            if use_window:
+                neighbours.update(self._neighbour_versions_by_window(chunk, direction, connection))
+            else:
+                neighbours.update(self._neighbour_versions_by_identity(chunk, direction))
+        return neighbours
+
+    def _neighbour_versions_by_window(self, objects, direction, connection):
+        opts = self.model._meta
+        qn = connection.ops.quote_name
+        pk = opts.pk
+        table = qn(opts.db_table)
+        # The versions of archived models are read from the union with their archive table, aliased as the table
+        archive_union = get_archive_unions(connection).get(opts.db_table)
+        sql = """
+            WITH sources AS (
+                SELECT {pk} AS source_id, {identity} AS source_identity FROM {versions} WHERE {pk} IN ({placeholders})
+            ), neighbours AS (
+                SELECT {pk} AS source_id,
+                       {function}({pk}) OVER (PARTITION BY {identity} ORDER BY {start}) AS neighbour_id
+                FROM {versions}
+                WHERE {identity} IN (SELECT source_identity FROM sources)
+            )
+            SELECT {table}.*, neighbours.source_id AS _source_id
+            FROM {versions} INNER JOIN neighbours ON {table}.{pk} = neighbours.neighbour_id
+            WHERE neighbours.source_id IN (SELECT source_id FROM sources)
+        """.format(
+            table=table,
+            versions='%s %s' % (archive_union, table) if archive_union else table,
+            pk=qn(pk.column),
+            identity=qn(opts.get_field('identity').column),
+            start=qn(opts.get_field('version_start_date').column),
+            function='LEAD' if direction == 'next' else 'LAG',
+            placeholders=', '.join(['%s'] * len(objects)),
+        )
+        params = [pk.get_db_prep_value(o.pk, connection) for o in objects]
+        return dict((pk.to_python(version._source_id), version)
+                    for version in self.raw(sql, params).using(connection.alias))
+
+    def _neighbour_versions_by_identity(self, objects, direction):
+        versions_by_identity = {}
+        versions = self.get_queryset()._including_archives().filter(identity__in=set(o.identity for o in objects))
+        for version in versions.order_by('version_start_date'):
+            versions_by_identity.setdefault(version.identity, []).append(version)
+        neighbours = {}
+        for object in objects:
+            versions = versions_by_identity.get(object.identity, [])
+            pks = [version.pk for version in versions]
+            if object.pk in pks:
+                index = pks.index(object.pk) + (1 if direction == 'next' else -1)
+                if 0 <= index < len(versions):
+                    neighbours[object.pk] = versions[index]
+        return neighbours
+
     @staticmethod
     def adjust_version_as_of(version, relations_as_of):
         """
@@ -242,6 +726,17 @@ class VersionManager(models.Manager):
         """
         return self._create_at(None, **kwargs)
 
+    def bulk_create(self, objs, timestamp=None, batch_size=None):
+        """
+        Creates many Versionables at once; this is the bulk counterpart of create().
+        See VersionedQuerySet.bulk_create() for details.
+        :param objs: iterable of unsaved Versionable instances
+        :param timestamp: point in time at which the instances have to be created; if None, now is used
+        :param batch_size: maximum number of objects inserted per query
+        :return: list of the created objects
+        """
+        return self.get_queryset().bulk_create(objs, timestamp=timestamp, batch_size=batch_size)
+
     def _create_at(self, timestamp=None, id=None, forced_identity=None, **kwargs):
         """
         WARNING: Only for internal use and testing.
@@ -256,8 +751,8 @@ class VersionManager(models.Manager):
         if id:
             if not self.validate_uuid(id):
                 raise ValueError("id, if provided, must be a valid UUID version 4 string")
-            # Ensure that it's a unicode string:
-            id = six.text_type(id)
+            # Ensure that it's a unicode string (or a UUID, when using native UUID fields):
+            id = self.model._meta.pk.to_python(six.text_type(id))
 
         else:
             id = Versionable.uuid()
@@ -265,7 +760,7 @@ class VersionManager(models.Manager):
         if forced_identity:
             if not self.validate_uuid(forced_identity):
                 raise ValueError("forced_identity, if provided, must be a valid UUID version 4 string")
-            ident = six.text_type(forced_identity)
+            ident = self.model._meta.get_field('identity').to_python(six.text_type(forced_identity))
         else:
             ident = id
 
@@ -281,7 +776,7 @@ class VersionManager(models.Manager):
         """
         Check that the UUID string is in fact a valid uuid.
         """
-        return self.uuid_valid_form_regex.match(uuid_string) is not None
+        return self.uuid_valid_form_regex.match(six.text_type(uuid_string)) is not None
 
 
 class VersionedWhereNode(WhereNode):
@@ -300,13 +795,16 @@ class VersionedWhereNode(WhereNode):
                 except AttributeError:
                     # Django 1.6 handles compilers as instancemethods
                     _query = qn.__self__.query
-                query_time = _query.querytime.time
-                apply_query_time = _query.querytime.active
-                # In Django 1.6 & 1.7, use the join_map to know, what *table* gets joined to which
-                # *left-hand sided* table
+                querytime = getattr(_query, 'querytime', QueryTime(time=None, active=False))
+                query_time = querytime.time
+                apply_query_time = querytime.active
+                # In Django 1.6 & 1.7, use the JoinInfo tuples in alias_map to know, what *alias* gets joined to
+                # which *left-hand sided* alias (aliases differ from the table names once they have been
+                # relabeled, e.g. in subqueries)
                 # In Django 1.8, use the Join objects in alias_map
                 if hasattr(_query, 'join_map'):
-                    for lhs, table, join_cols in _query.join_map:
+                    for table, join in _query.alias_map.items():
+                        lhs = join.lhs_alias
                         if (lhs == child.alias and table == child.related_alias) \
                                 or (lhs == child.related_alias and table == child.alias):
                             child.set_joined_alias(table)
@@ -321,7 +819,14 @@ class VersionedWhereNode(WhereNode):
                                 or (lhs == child.related_alias and table == child.alias):
                             child.set_joined_alias(table)
                             break
-                if apply_query_time:
+                if child._joined_alias and hasattr(_query, 'original_table_name'):
+                    child.joined_table = _query.original_table_name(child._joined_alias)
+                elif child._joined_alias:
+                    child.joined_table = _query.alias_map[child._joined_alias].table_name
+                # Queries cloned into other Query classes are no VersionedQuery, but they do not read snapshot
+                # tables either
+                if apply_query_time and not (getattr(_query, 'snapshot_tables', None)
+                                             and _query.is_snapshot_alias(child._joined_alias)):
                     # Add query parameters that have not been added till now
                     child.set_as_of(query_time)
                 else:
@@ -348,6 +853,8 @@ class VersionedExtraWhere(ExtraWhere):
         self._as_of_time_set = False
         self.as_of_time = None
         self._joined_alias = None
+        # The table name of the joined alias
+        self.joined_table = None
 
     def set_as_of(self, as_of_time):
         self.as_of_time = as_of_time
@@ -372,7 +879,10 @@ class VersionedExtraWhere(ExtraWhere):
 
         # Set the SQL string in dependency of whether as_of_time was set or not
         if self._as_of_time_set:
-            if self.as_of_time:
+            if self.as_of_time and use_validity_range(connection, self.joined_table):
+                sql = VALIDITY_RANGE_SQL
+                params = [self.as_of_time]
+            elif self.as_of_time:
                 sql = self.historic_sql
                 params = [self.as_of_time] * 2
                 # 2 is the number of occurences of the timestamp in an as_of-filter expression
@@ -404,15 +914,27 @@ class VersionedQuery(Query):
     that they can provide that information when building the sql.
     """
 
+    # Whether the archive tables are read whatever the query time is (see VersionedQuerySet._including_archives)
+    include_archives = False
+
     def __init__(self, *args, **kwargs):
         kwargs['where'] = VersionedWhereNode
         super(VersionedQuery, self).__init__(*args, **kwargs)
         self.querytime = QueryTime(time=None, active=False)
+        self.snapshot_tables = {}
+        self._replaced_tables = {}
 
-    def clone(self, *args, **kwargs):
-        _clone = super(VersionedQuery, self).clone(*args, **kwargs)
+    def clone(self, klass=None, *args, **kwargs):
+        if klass is UpdateQuery:
+            klass = VersionedUpdateQuery
+        _clone = super(VersionedQuery, self).clone(klass, *args, **kwargs)
         try:
             _clone.querytime = self.querytime
+            _clone.snapshot_tables = self.snapshot_tables
+            _clone.include_archives = self.include_archives
+            _clone._replaced_tables = {}
+            for alias, table in self._replaced_tables.items():
+                _clone.alias_map[alias] = table
         except AttributeError:
             # If the caller is using clone to create a different type of Query, that's OK.
             # An example of this is when creating or updating an object, this method is called
@@ -420,16 +942,38 @@ class VersionedQuery(Query):
             pass
         return _clone
 
-    def get_compiler(self, *args, **kwargs):
+    def get_compiler(self, using=None, connection=None):
         """
         Add the query time restriction limit at the last moment.  Applying it earlier
         (e.g. by adding a filter to the queryset) does not allow the caching of related
         object to work (they are attached to a queryset; filter() returns a new queryset).
         """
-        if self.querytime.active and (not hasattr(self, '_querytime_filter_added') or not self._querytime_filter_added):
+        if using is None and connection is None:
+            raise ValueError("Need either using or connection")
+        if using:
+            connection = connections[using]
+        on_snapshot = False
+        if self.snapshot_tables:
+            # The base table's alias may not exist yet (e.g. for an unfiltered count()); it must be set up
+            # before the tables are replaced
+            on_snapshot = self.is_snapshot_alias(self.get_initial_alias())
+            self._replace_tables(self.snapshot_tables, versioned_only=True)
+        if self.querytime.active and self.querytime.time is None \
+                and versions_settings.get_setting('VERSIONED_PARTITIONED_MODELS'):
+            self.get_initial_alias()
+            self._replace_tables(get_current_partitions(connection), versioned_only=True)
+        if (self.include_archives or self.querytime.active and self.querytime.time is not None) \
+                and versions_settings.get_setting('VERSIONED_ARCHIVED_MODELS'):
+            self.get_initial_alias()
+            self._replace_tables(get_archive_unions(connection))
+        if self.querytime.active and not on_snapshot \
+                and (not hasattr(self, '_querytime_filter_added') or not self._querytime_filter_added):
             time = self.querytime.time
             if time is None:
                 self.add_q(Q(version_end_date__isnull=True))
+            elif use_validity_range(connection, self.original_table_name(self.get_initial_alias())):
+                alias = connection.ops.quote_name(self.get_initial_alias())
+                self.where.add(ExtraWhere([VALIDITY_RANGE_SQL.format(alias=alias)], [time]), AND)
             else:
                 self.add_q(
                     (Q(version_end_date__gt=time) | Q(version_end_date__isnull=True))
@@ -438,7 +982,93 @@ class VersionedQuery(Query):
             # Ensure applying these filters happens only a single time (even if it doesn't falsify the query, it's
             # just not very comfortable to read)
             self._querytime_filter_added = True
-        return super(VersionedQuery, self).get_compiler(*args, **kwargs)
+        compiler = super(VersionedQuery, self).get_compiler(using=using, connection=connection)
+        for table in self.alias_map.values():
+            if table.table_name.startswith('('):
+                # Unions with archive tables must not be quoted like table names
+                compiler.quote_cache[table.table_name] = table.table_name
+        return compiler
+
+    def _replace_tables(self, tables, versioned_only=False):
+        """
+        Replaces the tables of the query by the tables they are mapped to (snapshot tables or current partitions).
+        The aliases are kept, so that the rest of the query does not need to be changed. Clones of the query get
+        the original tables back, since their query time may differ.
+
+        :param dict tables: mapping of table names to the names of the tables replacing them
+        :param bool versioned_only: if True, only the base table and the tables joined through a VersionedForeignKey
+            are replaced; tables joined otherwise (e.g. through a plain ForeignKey pointing a specific, possibly
+            historic version) are not restricted to the query time, so they must be read in full
+        """
+        for alias, table in list(self.alias_map.items()):
+            replacement = tables.get(table.table_name)
+            if replacement and versioned_only and not self._is_versioned_alias(alias):
+                continue
+            if replacement:
+                self._replaced_tables.setdefault(alias, table)
+                if hasattr(table, '_replace'):
+                    # Django 1.6 & 1.7 use JoinInfo namedtuples
+                    table = table._replace(table_name=replacement)
+                else:
+                    table = copy.copy(table)
+                    table.table_name = replacement
+                self.alias_map[alias] = table
+
+    def original_table_name(self, alias):
+        """
+        Gets the name of the table of an alias as it was before being replaced (see _replace_tables).
+
+        :param str alias: table alias
+        :return: str
+        """
+        return self._replaced_tables.get(alias, self.alias_map[alias]).table_name
+
+    def _is_versioned_alias(self, alias):
+        """
+        Checks whether the given alias is a base table of the query or is joined through a VersionedForeignKey
+        (in either direction), i.e. whether its rows are restricted to the query time.
+
+        :param str alias: table alias
+        :return: bool
+        """
+        table = self.alias_map[alias]
+        # Django 1.6 & 1.7 use JoinInfo namedtuples, with join_type None for base tables; Django 1.8 uses
+        # BaseTable objects, which have no join_field
+        join_field = getattr(table, 'join_field', None)
+        if join_field is None:
+            return True
+        # Reverse joins are made through the relation object of the field
+        return isinstance(join_field, VersionedForeignKey) \
+            or isinstance(getattr(join_field, 'field', None), VersionedForeignKey)
+
+    def is_snapshot_alias(self, alias):
+        """
+        Checks whether the given alias refers to a snapshot table. Snapshot tables only contain the versions
+        valid at the snapshot's time, so no query time restriction is needed for them.
+
+        :param str alias: table alias
+        :return: bool
+        """
+        if not self.snapshot_tables or alias not in self.alias_map:
+            return False
+        table_name = self.alias_map[alias].table_name
+        return table_name in self.snapshot_tables or table_name in self.snapshot_tables.values()
+
+
+class VersionedUpdateQuery(UpdateQuery):
+    """
+    The UpdateQuery used for updating the objects of a VersionedQuerySet.  It passes the query time on to its
+    clones.  The subquery selecting the objects to be updated when the update is filtered through a join is made
+    a VersionedQuery, so that it is restricted to the query time like the QuerySet it comes from.
+    """
+
+    def clone(self, klass=None, **kwargs):
+        if klass is Query:
+            klass = VersionedQuery
+            kwargs.setdefault('snapshot_tables', {})
+            kwargs.setdefault('_replaced_tables', {})
+        kwargs.setdefault('querytime', self.querytime)
+        return super(VersionedUpdateQuery, self).clone(klass, **kwargs)
 
 
 class VersionedQuerySet(QuerySet):
@@ -457,6 +1087,7 @@ class VersionedQuerySet(QuerySet):
             query = VersionedQuery(model)
         super(VersionedQuerySet, self).__init__(model=model, query=query, *args, **kwargs)
         self.querytime = QueryTime(time=None, active=False)
+        self._prefetch_versioned_lookups = []
 
     @property
     def querytime(self):
@@ -494,11 +1125,86 @@ class VersionedQuerySet(QuerySet):
         if self._result_cache is None:
             self._result_cache = list(self.iterator())
             if not isinstance(self, ValuesListQuerySet):
-                for x in self._result_cache:
-                    self._set_item_querytime(x)
+                if self._prefetch_versioned_lookups and not isinstance(self, ValuesQuerySet):
+                    prefetch_versioned_objects(self._result_cache, self._prefetch_versioned_lookups, using=self.db)
         if self._prefetch_related_lookups and not self._prefetch_done:
             self._prefetch_related_objects()
 
+    def iterator(self):
+        """
+        Overrides the QuerySet.iterator method by adding the timestamp to all objects, so that objects
+        retrieved without caching them in the QuerySet are as_of the same time as cached ones.
+        :return: See django.db.models.query.QuerySet.iterator for return values
+        """
+        for item in super(VersionedQuerySet, self).iterator():
+            yield self._set_item_querytime(item)
+
+    def stream(self, chunk_size=2000):
+        """
+        Iterates over the objects of this QuerySet using a constant amount of memory, no matter how many objects
+        there are. Like iterator(), the objects are not cached in the QuerySet, and they are given the QuerySet's
+        query time.
+
+        On PostgreSQL, the primary keys are read in chunks from a server-side cursor (without keeping a transaction
+        open), and the objects of each chunk are loaded with one query; the ordering of the QuerySet is kept.
+        On other databases, the objects are loaded in chunks ordered by primary key, each chunk starting after the
+        last primary key of the previous one (keyset pagination); the ordering of the QuerySet is ignored.
+
+        select_related(), prefetch_related() and prefetch_versioned() are applied to each chunk.
+
+        :param int chunk_size: number of objects loaded per query
+        :return: iterator over the objects
+        """
+        if connections[self.db].vendor == 'postgresql':
+            return self._stream_with_cursor(chunk_size)
+        return self._stream_by_keyset(chunk_size)
+
+    def _stream_with_cursor(self, chunk_size):
+        connection = connections[self.db]
+        pk_field = self.model._meta.pk
+        sql, params = self.values_list('pk', flat=True).query.get_compiler(using=self.db).as_sql()
+        cursor_name = 'versions_stream_%s' % uuid.uuid4().hex
+        chunk_queryset = self._clone()
+        chunk_queryset.query.clear_limits()
+        chunk_queryset = chunk_queryset.order_by()
+        cursor = connection.cursor()
+        try:
+            # A WITH HOLD cursor outlives the transaction it was declared in, so that no transaction needs to be kept
+            # open while the caller is processing the objects (nor is the caller's work rolled back when it stops
+            # iterating early)
+            cursor.execute('DECLARE %s NO SCROLL CURSOR WITH HOLD FOR %s' % (cursor_name, sql), params)
+            try:
+                while True:
+                    cursor.execute('FETCH FORWARD %d FROM %s' % (chunk_size, cursor_name))
+                    pks = [pk_field.to_python(row[0]) for row in cursor.fetchall()]
+                    if not pks:
+                        break
+                    objects = dict((obj.pk, obj) for obj in chunk_queryset.filter(pk__in=pks))
+                    for pk in pks:
+                        # Objects changed since the cursor was opened may not be found anymore
+                        if pk in objects:
+                            yield objects[pk]
+            finally:
+                try:
+                    cursor.execute('CLOSE %s' % cursor_name)
+                except DatabaseError:
+                    # The transaction was aborted; the cursor is gone once it is rolled back
+                    pass
+        finally:
+            cursor.close()
+
+    def _stream_by_keyset(self, chunk_size):
+        queryset = self.order_by('pk')
+        last_pk = None
+        while True:
+            chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            chunk = list(chunk[:chunk_size])
+            for obj in chunk:
+                yield obj
+            if len(chunk) < chunk_size:
+                break
+            last_pk = chunk[-1].pk
+
     def _clone(self, *args, **kwargs):
         """
         Overrides the QuerySet._clone method by adding the cloning of the VersionedQuerySet's query_time parameter
@@ -524,6 +1230,7 @@ class VersionedQuerySet(QuerySet):
 
         clone = super(VersionedQuerySet, self)._clone(**kwargs)
         clone.querytime = self.querytime
+        clone._prefetch_versioned_lookups = self._prefetch_versioned_lookups[:]
         return clone
 
     def _set_item_querytime(self, item, type_check=True):
@@ -557,6 +1264,115 @@ class VersionedQuerySet(QuerySet):
         clone.querytime = QueryTime(time=qtime, active=True)
         return clone
 
+    def prefetch_versioned(self, *lookups):
+        """
+        Returns a new QuerySet instance that will prefetch the objects referenced by the given VersionedForeignKeys
+        when it is evaluated. The related objects are fetched in the version valid at the query time of the objects
+        referencing them, using a single query per relation, and are returned by the foreign key's descriptor without
+        querying the database.
+
+        When prefetch_versioned() is called more than once, the list of lookups to prefetch is appended to. Call
+        prefetch_versioned(None) to clear the list.
+
+        :param lookups: names of VersionedForeignKey fields; relations of the related objects can be followed using
+            the usual double-underscore notation (e.g. 'team__city')
+        :return: A VersionedQuerySet
+        """
+        clone = self._clone()
+        if lookups == (None,):
+            clone._prefetch_versioned_lookups = []
+        else:
+            clone._prefetch_versioned_lookups.extend(lookups)
+        return clone
+
+    def _including_archives(self):
+        """
+        Returns a clone of this QuerySet reading the versions of archived models (see the VERSIONED_ARCHIVED_MODELS
+        setting) from both the model's table and its archive table, whatever its query time is.
+        Used by the VersionManager to navigate through all versions of objects.
+
+        :return: VersionedQuerySet
+        """
+        clone = self._clone()
+        clone.query.include_archives = True
+        return clone
+
+    def field_changes(self, *fields):
+        """
+        Returns the changes of the given fields between consecutive versions of the objects in this QuerySet, ordered
+        by identity and time.
+
+        Where the database supports window functions, the versions are compared to their predecessors using LAG()
+        already in the database, so that only the versions involved in a change are fetched. Elsewhere, all versions
+        are fetched and compared in Python.
+
+        :param fields: names of the fields whose changes are returned; all fields except the versioning fields if
+            none are given
+        :return: iterator of FieldChange(identity, field, old_value, new_value, timestamp) tuples, where timestamp is
+            the version_start_date of the version introducing the new value; foreign keys are given by their value
+        """
+        opts = self.model._meta
+        if fields:
+            fields = [opts.get_field(name) for name in fields]
+        else:
+            fields = [f for f in opts.concrete_fields if f.name not in Versionable.VERSIONABLE_FIELDS]
+
+        queryset = self
+        connection = connections[self.db]
+        if supports_window_functions(connection) and fields:
+            sql, params = self._changed_versions_sql(fields, connection)
+            qn = connection.ops.quote_name
+            queryset = self.extra(where=['%s.%s IN (%s)' % (qn(opts.db_table), qn(opts.pk.column), sql)],
+                                  params=params)
+        return self._iter_field_changes(queryset.order_by('identity', 'version_start_date'), fields)
+
+    def _changed_versions_sql(self, fields, connection):
+        """
+        Builds the SQL selecting the pks of the versions of this QuerySet, in which any of the fields has a value
+        different from the previous version, as well as the pks of these previous versions.
+
+        :return: tuple of SQL and params
+        """
+        qn = connection.ops.quote_name
+        opts = self.model._meta
+        distinct = 'IS DISTINCT FROM' if connection.vendor == 'postgresql' else 'IS NOT'
+        versions = self.values_list('pk', 'identity', 'version_start_date', *[f.name for f in fields])
+        versions_sql, params = versions.query.get_compiler(using=self.db).as_sql()
+        changed = ' OR '.join('{col} {distinct} LAG({col}) OVER w'.format(col=qn(f.column), distinct=distinct)
+                              for f in fields)
+        sql = """
+            SELECT version_id FROM (
+                SELECT version_id, changed, LEAD(changed) OVER w AS next_changed FROM (
+                    SELECT {pk} AS version_id, {identity}, {start},
+                           CASE WHEN LAG({pk}) OVER w IS NOT NULL AND ({changed}) THEN 1 ELSE 0 END AS changed
+                    FROM ({versions_sql}) versions
+                    WINDOW w AS (PARTITION BY {identity} ORDER BY {start})
+                ) flagged
+                WINDOW w AS (PARTITION BY {identity} ORDER BY {start})
+            ) needed
+            WHERE changed = 1 OR next_changed = 1
+        """.format(pk=qn(opts.pk.column), identity=qn(opts.get_field('identity').column),
+                   start=qn(opts.get_field('version_start_date').column), changed=changed, versions_sql=versions_sql)
+        return sql, params
+
+    @staticmethod
+    def _iter_field_changes(versions, fields):
+        """
+        Compares consecutive versions of each identity and yields the changes of the fields' values.
+        Versions not being consecutive are only compared when no field changed in between, so they never
+        produce changes.
+        """
+        for identity, group in itertools.groupby(versions.iterator(), key=lambda version: version.identity):
+            previous = None
+            for version in group:
+                if previous is not None:
+                    for field in fields:
+                        old_value = getattr(previous, field.attname)
+                        new_value = getattr(version, field.attname)
+                        if old_value != new_value:
+                            yield FieldChange(identity, field.name, old_value, new_value, version.version_start_date)
+                previous = version
+
     def delete(self):
         """
         Deletes the records in the QuerySet.
@@ -588,6 +1404,209 @@ class VersionedQuerySet(QuerySet):
     delete.alters_data = True
     delete.queryset_only = True
 
+    def clone_all(self, **changes):
+        """
+        Clones all current Versionables of this QuerySet at once, using one shared timestamp.
+
+        This is the set-based counterpart of Versionable.clone(): the current versions are terminated
+        and their successors are written using a constant number of statements per chunk of objects
+        (plus the same for every many-to-many relationship), no matter how many objects are concerned.
+
+        Models using multi-table inheritance are not supported.
+
+        :param changes: field values to set on the new versions
+        :return: list of the new (current) versions
+        """
+        if self.model._meta.parents:
+            raise TypeError("clone_all() does not support models using multi-table inheritance")
+        return self._clone_all_at(None, **changes)
+
+    clone_all.alters_data = True
+
+    def _clone_all_at(self, timestamp=None, **changes):
+        """
+        WARNING: This method is only for internal use, it should not be used
+        from outside.
+
+        Clones all current Versionables of this QuerySet at the given timestamp.
+        :param timestamp: point in time at which the objects are cloned; if None, now is used
+        :param changes: field values to set on the new versions
+        :return: list of the new (current) versions
+        """
+        assert self.query.can_filter(), \
+            "Cannot use 'limit' or 'offset' with clone_all."
+
+        if timestamp is None:
+            timestamp = get_utc_now()
+
+        # Only current objects can be cloned
+        clone_query = self.filter(version_end_date__isnull=True)
+        clone_query._for_write = True
+        db = clone_query.db
+
+        with transaction.atomic(using=db, savepoint=False):
+            earlier_versions = list(clone_query)
+            if not earlier_versions:
+                return []
+
+            # Just like in Versionable.clone(), the later version keeps the id and the earlier version gets
+            # a new one
+            id_map = {}
+            later_versions = []
+            for earlier_version in earlier_versions:
+                later_version = copy.copy(earlier_version)
+                later_version.version_start_date = timestamp
+                for name, value in six.iteritems(changes):
+                    setattr(later_version, name, value)
+                later_versions.append(later_version)
+
+                earlier_version.id = Versionable.uuid()
+                earlier_version.version_end_date = timestamp
+                id_map[later_version.id] = earlier_version.id
+
+            self.model.objects.using(db)._bulk_insert(earlier_versions)
+            values = dict(changes, version_start_date=timestamp)
+            UpdateQuery(self.model).update_batch(list(id_map.keys()), values, db)
+
+            # re-create ManyToMany relations
+            for field_name in self.model.get_all_m2m_field_names():
+                source_field = self.model._get_m2m_source_field(field_name)
+                Versionable._clone_relations_in_bulk(source_field, id_map, timestamp, using=db)
+
+        return later_versions
+
+    def update_versioned(self, **values):
+        """
+        Updates all current Versionables of this QuerySet with the given values, keeping their history.
+
+        Unlike update(), which overwrites the rows in place, the current versions are terminated and their
+        successors carry the new values. The objects are not loaded into memory: the historic versions are
+        copied by the database (INSERT ... SELECT), and the successors are written by an UPDATE, so values
+        may also be expressions like F('price') * 2. All this happens inside a single transaction, at one
+        shared timestamp, with a constant number of statements per chunk of objects.
+
+        Models using multi-table inheritance are not supported.
+
+        :param values: field values to set on the new versions
+        :return: number of updated objects
+        :rtype: int
+        """
+        assert self.query.can_filter(), \
+            "Cannot update a query once a slice has been taken."
+        if self.model._meta.parents:
+            raise TypeError("update_versioned() does not support models using multi-table inheritance")
+
+        timestamp = get_utc_now()
+        update_query = self.filter(version_end_date__isnull=True)
+        update_query._for_write = True
+        db = update_query.db
+
+        with transaction.atomic(using=db, savepoint=False):
+            pk_list = list(update_query.values_list('pk', flat=True))
+            if not pk_list:
+                return 0
+
+            id_map = dict((pk, Versionable.uuid()) for pk in pk_list)
+            for offset in range(0, len(pk_list), GET_ITERATOR_CHUNK_SIZE):
+                self._insert_earlier_versions(pk_list[offset:offset + GET_ITERATOR_CHUNK_SIZE], id_map, timestamp, db)
+            UpdateQuery(self.model).update_batch(pk_list, dict(values, version_start_date=timestamp), db)
+
+            # re-create ManyToMany relations
+            for field_name in self.model.get_all_m2m_field_names():
+                source_field = self.model._get_m2m_source_field(field_name)
+                Versionable._clone_relations_in_bulk(source_field, id_map, timestamp, using=db)
+
+        return len(pk_list)
+
+    update_versioned.alters_data = True
+
+    def bulk_create(self, objs, timestamp=None, batch_size=None):
+        """
+        Creates many Versionables at once; this is the bulk counterpart of create().
+
+        Just like with create(), every object gets a new id, which is also used as its identity, unless an id
+        (and identity) has been set on the object; these must be valid version 4 UUIDs. All objects share the
+        same version_start_date and version_birth_date. The objects are then inserted in batches.
+        :param objs: iterable of unsaved Versionable instances
+        :param timestamp: point in time at which the instances have to be created; if None, now is used
+        :param batch_size: maximum number of objects inserted per query
+        :return: list of the created objects
+        """
+        if self.model._meta.auto_created:
+            # The rows of intermediary many-to-many models are created by the related managers, which set their
+            # versioning fields themselves (e.g. add_at())
+            return self._bulk_insert(objs, batch_size=batch_size)
+        objs = list(objs)
+        for obj in objs:
+            if obj.id and not VersionManager.uuid_valid_form_regex.match(six.text_type(obj.id)):
+                raise ValueError("id, if provided, must be a valid UUID version 4 string")
+            if obj.identity and not VersionManager.uuid_valid_form_regex.match(six.text_type(obj.identity)):
+                raise ValueError("identity, if provided, must be a valid UUID version 4 string")
+        if timestamp is None:
+            timestamp = get_utc_now()
+        id_field = self.model._meta.pk
+        identity_field = self.model._meta.get_field('identity')
+        for obj in objs:
+            obj.id = id_field.to_python(six.text_type(obj.id)) if obj.id else Versionable.uuid()
+            obj.identity = identity_field.to_python(six.text_type(obj.identity)) if obj.identity else obj.id
+            obj.version_start_date = obj.version_birth_date = timestamp
+        return self._bulk_insert(objs, batch_size=batch_size)
+
+    def _bulk_insert(self, objs, batch_size=None):
+        """
+        WARNING: This method is only for internal use, it should not be used
+        from outside.
+
+        Inserts the given objects as they are (e.g. historic versions having their version dates set already),
+        like QuerySet.bulk_create().
+        """
+        return super(VersionedQuerySet, self).bulk_create(objs, batch_size=batch_size)
+
+    def _insert_earlier_versions(self, pk_list, id_map, timestamp, using):
+        """
+        Lets the database copy the given rows into historic versions, which end at timestamp and get
+        the ids defined by id_map, using a single INSERT ... SELECT statement.
+
+        :param list pk_list: primary keys of the rows to copy
+        :param dict id_map: maps each primary key to the id of the historic version
+        :param timestamp: the version_end_date of the historic versions
+        :param str using: database alias to use
+        """
+        connection = connections[using]
+        qn = connection.ops.quote_name
+        opts = self.model._meta
+        pk_field = opts.pk
+        end_field = opts.get_field('version_end_date')
+
+        select_columns = []
+        params = []
+        for field in opts.local_concrete_fields:
+            if field is pk_field:
+                select_columns.append('CASE %s %s END' % (
+                    qn(field.column), ' '.join(['WHEN %s THEN %s'] * len(pk_list))))
+                for pk in pk_list:
+                    params += [pk_field.get_db_prep_value(pk, connection),
+                               pk_field.get_db_prep_value(id_map[pk], connection)]
+            elif field is end_field:
+                select_columns.append('%s')
+                params.append(end_field.get_db_prep_value(timestamp, connection))
+            else:
+                select_columns.append(qn(field.column))
+        params += [pk_field.get_db_prep_value(pk, connection) for pk in pk_list]
+
+        sql = 'INSERT INTO {table} ({columns}) SELECT {select_columns} FROM {table} WHERE {pk} IN ({pk_list})'.format(
+            table=qn(opts.db_table),
+            columns=', '.join(qn(f.column) for f in opts.local_concrete_fields),
+            select_columns=', '.join(select_columns),
+            pk=qn(pk_field.column),
+            pk_list=', '.join(['%s'] * len(pk_list)),
+        )
+        cursor = connection.cursor()
+        try:
+            cursor.execute(sql, params)
+        finally:
+            cursor.close()
+
 
 class VersionedForeignKey(ForeignKey):
     """
@@ -749,9 +1768,8 @@ class VersionedReverseSingleRelatedObjectDescriptor(ReverseSingleRelatedObjectDe
     A ReverseSingleRelatedObjectDescriptor-typed object gets inserted, when a ForeignKey
     is defined in a Django model. This is one part of the analogue for versioned items.
 
-    Unfortunately, we need to run two queries. The first query satisfies the foreign key
-    constraint. After extracting the identity information and combining it with the datetime-
-    stamp, we are able to fetch the historic element.
+    The related object is looked up by the identity of the version the foreign key points to,
+    restricted to the instance's query time. Both steps are done in a single query.
     """
 
     def __get__(self, instance, instance_type=None):
@@ -762,11 +1780,17 @@ class VersionedReverseSingleRelatedObjectDescriptor(ReverseSingleRelatedObjectDe
         :param instance_type: The type of the instance object
         :return: Returns a Versionable
         """
-        current_elt = super(VersionedReverseSingleRelatedObjectDescriptor, self).__get__(instance, instance_type)
-
         if instance is None:
             return self
 
+        querytime = getattr(instance, '_querytime', QueryTime(time=None, active=True))
+        if not hasattr(instance, self.cache_name) and querytime.active:
+            value = getattr(instance, self.field.attname)
+            if value is not None:
+                setattr(instance, self.cache_name, self.get_object_as_of(instance, value, querytime))
+
+        current_elt = super(VersionedReverseSingleRelatedObjectDescriptor, self).__get__(instance, instance_type)
+
         if not current_elt:
             return None
 
@@ -775,15 +1799,27 @@ class VersionedReverseSingleRelatedObjectDescriptor(ReverseSingleRelatedObjectDe
                             + str(type(current_elt))
                             + ", which is not a subclass of Versionable")
 
-        if hasattr(instance, '_querytime'):
-            # If current_elt matches the instance's querytime, there's no need to make a database query.
-            if Versionable.matches_querytime(current_elt, instance._querytime):
-                current_elt._querytime = instance._querytime
-                return current_elt
+        # If current_elt matches the instance's querytime, there's no need to make a database query.
+        if Versionable.matches_querytime(current_elt, querytime):
+            current_elt._querytime = querytime
+            return current_elt
 
-            return current_elt.__class__.objects.as_of(instance._querytime.time).get(identity=current_elt.identity)
-        else:
-            return current_elt.__class__.objects.current.get(identity=current_elt.identity)
+        current_elt = self.get_object_as_of(instance, current_elt.id, querytime)
+        setattr(instance, self.cache_name, current_elt)
+        return current_elt
+
+    def get_object_as_of(self, instance, pk, querytime):
+        """
+        Fetches the version, valid at the given query time, of the object whose version pk points to.
+        The identity of that object is looked up by a subquery, so that a single query is needed.
+        :param instance: The object on which the property was accessed
+        :param pk: The id of any version of the related object
+        :param QueryTime querytime: The query time to restrict the related object to
+        :return: Returns a Versionable
+        """
+        queryset = self.get_queryset(instance=instance)
+        identity = queryset.filter(pk=pk).values('identity')
+        return queryset.as_of(querytime.time).get(identity__in=identity)
 
 
 class VersionedForeignRelatedObjectsDescriptor(ForeignRelatedObjectsDescriptor):
@@ -816,6 +1852,31 @@ class VersionedForeignRelatedObjectsDescriptor(ForeignRelatedObjectsDescriptor):
                     queryset = queryset.as_of(self.instance._querytime.time)
                 return queryset
 
+            def get_prefetch_queryset(self, instances, queryset=None):
+                """
+                Overridden to fetch the related objects of every instance as of the instance's query time.
+                The instances are grouped by their query time, and one query is made per group. Related objects
+                are matched to the instances by identity and query time.
+                """
+                if queryset is None:
+                    queryset = super(manager_cls, self).get_queryset()
+                queryset = queryset.using(queryset._db or self._db)
+                rel_objs = []
+                for querytime, group in _group_by_querytime(instances):
+                    instances_by_identity = dict((instance.identity, instance) for instance in group)
+                    group_queryset = queryset.filter(**{'%s__in' % rel_field.name: list(instances_by_identity)})
+                    group_queryset.querytime = querytime
+                    for rel_obj in group_queryset:
+                        # Since the reverse relation is not managed by get_queryset(), set it manually
+                        setattr(rel_obj, rel_field.get_cache_name(),
+                                instances_by_identity[getattr(rel_obj, rel_field.attname)])
+                        rel_objs.append(rel_obj)
+                return (rel_objs,
+                        lambda rel_obj: (getattr(rel_obj, rel_field.attname), rel_obj._querytime),
+                        lambda instance: (instance.identity, instance._querytime),
+                        False,
+                        rel_field.related_query_name())
+
             def add(self, *objs):
                 cloned_objs = ()
                 for obj in objs:
@@ -903,6 +1964,25 @@ def create_versioned_many_related_manager(superclass, rel):
                     queryset = queryset.as_of(self.instance._querytime.time)
             return queryset
 
+        def get_prefetch_queryset(self, instances, *args):
+            """
+            Overridden to fetch the related objects of every instance as of the instance's query time.
+            The instances are grouped by their query time, and one query is made per group. Related objects
+            are matched to the instances by id and query time.
+            """
+            rel_objs = []
+            for querytime, group in _group_by_querytime(instances):
+                queryset, rel_obj_attr, instance_attr, single, cache_name = \
+                    super(VersionedManyRelatedManager, self).get_prefetch_queryset(group, *args)
+                queryset = queryset._clone()
+                queryset.querytime = querytime
+                rel_objs.extend(queryset)
+            return (rel_objs,
+                    lambda rel_obj: (rel_obj_attr(rel_obj), rel_obj._querytime),
+                    lambda instance: (instance_attr(instance), instance._querytime),
+                    single,
+                    cache_name)
+
         def _remove_items(self, source_field_name, target_field_name, *objs):
             """
             Instead of removing items, we simply set the version_end_date of the current item to the
@@ -913,6 +1993,13 @@ def create_versioned_many_related_manager(superclass, rel):
             return self._remove_items_at(None, source_field_name, target_field_name, *objs)
 
         def _remove_items_at(self, timestamp, source_field_name, target_field_name, *objs):
+            """
+            Terminates the current relations to the given objects at timestamp, using a single UPDATE statement.
+
+            :return: number of terminated relations
+            :rtype: int
+            """
+            removed = 0
             if objs:
                 if timestamp is None:
                     timestamp = get_utc_now()
@@ -932,12 +2019,13 @@ def create_versioned_many_related_manager(superclass, rel):
                     else:
                         old_ids.add(obj)
                 db = router.db_for_write(self.through, instance=self.instance)
-                qs = self.through._default_manager.using(db).filter(**{
+                removed = self.through._default_manager.using(db).filter(**{
                     source_field_name: self.instance.id,
-                    '%s__in' % target_field_name: old_ids
-                }).as_of(timestamp)
-                for relation in qs:
-                    relation._delete_at(timestamp)
+                    '%s__in' % target_field_name: old_ids,
+                    'version_start_date__lte': timestamp,
+                    'version_end_date__isnull': True,
+                }).update(version_end_date=timestamp)
+            return removed
 
         if 'add' in dir(many_related_manager_klass):
             def add(self, *objs):
@@ -990,12 +2078,16 @@ def create_versioned_many_related_manager(superclass, rel):
                 """
                 Performs the act of removing specified relationships at a specified time (timestamp);
                 So, not the objects at a given time are removed, but their relationship!
+
+                :return: number of terminated relations
+                :rtype: int
                 """
-                self._remove_items_at(timestamp, self.source_field_name, self.target_field_name, *objs)
+                removed = self._remove_items_at(timestamp, self.source_field_name, self.target_field_name, *objs)
 
                 # For consistency, also handle the symmetrical case
                 if self.symmetrical:
-                    self._remove_items_at(timestamp, self.target_field_name, self.source_field_name, *objs)
+                    removed += self._remove_items_at(timestamp, self.target_field_name, self.source_field_name, *objs)
+                return removed
 
             remove_at.alters_data = True
 
@@ -1135,10 +2227,10 @@ class Versionable(models.Model):
     VERSIONABLE_FIELDS = [VERSION_IDENTIFIER_FIELD, OBJECT_IDENTIFIER_FIELD, 'version_start_date',
                           'version_end_date', 'version_birth_date']
 
-    id = models.CharField(max_length=36, primary_key=True)
+    id = uuid_field(primary_key=True)
     """id stands for ID and is the primary key; sometimes also referenced as the surrogate key"""
 
-    identity = models.CharField(max_length=36)
+    identity = uuid_field()
     """identity is used as the identifier of an object, ignoring its versions; sometimes also referenced as the natural key"""
 
     version_start_date = models.DateTimeField()
@@ -1169,6 +2261,29 @@ class Versionable(models.Model):
         # _querytime is for library-internal use.
         self._querytime = QueryTime(time=None, active=False)
 
+        # New objects (including the ones of intermediary many-to-many models) get their versioning fields
+        # initialized here. Objects loaded from the database have them set already; deferred fields are not
+        # in __dict__, so they are neither loaded nor overwritten.
+        values = self.__dict__
+        if not (values.get('id', True) and values.get('identity', True)
+                and values.get('version_start_date', True) and values.get('version_birth_date', True)):
+            self._initialize_version_fields()
+
+    def _initialize_version_fields(self):
+        """
+        Sets the id, identity, version_start_date and version_birth_date fields of a new object,
+        as far as they have not been set yet.
+        """
+        now = get_utc_now()
+        if not self.id:
+            self.id = self.uuid()
+        if not self.identity:
+            self.identity = self.id
+        if self.version_start_date is None:
+            self.version_start_date = now
+        if self.version_birth_date is None:
+            self.version_birth_date = now
+
     def delete(self, using=None):
         using = using or router.db_for_write(self.__class__, instance=self)
         assert self._get_pk_val() is not None, \
@@ -1237,8 +2352,12 @@ class Versionable(models.Model):
         """
         Gets a new uuid string that is valid to use for id and identity fields.
 
+        When VERSIONED_NATIVE_UUID is enabled, a UUID object is returned instead of a string.
+
         :return: unicode uuid string
         """
+        if versions_settings.get_setting('VERSIONED_NATIVE_UUID'):
+            return uuid.uuid4()
         return six.u(str(uuid.uuid4()))
 
     def _clone_at(self, timestamp):
@@ -1251,7 +2370,7 @@ class Versionable(models.Model):
         """
         return self.clone(forced_version_date=timestamp)
 
-    def clone(self, forced_version_date=None, in_bulk=False):
+    def clone(self, forced_version_date=None, in_bulk=False, server_side=False):
         """
         Clones a Versionable and returns a fresh copy of the original object.
         Original source: ClonableMixin snippet (http://djangosnippets.org/snippets/1271), with the pk/id change
@@ -1260,6 +2379,8 @@ class Versionable(models.Model):
         :param forced_version_date: a timestamp including tzinfo; this value is usually set only internally!
         :param in_bulk: whether not to write this objects to the database already, if not necessary; this value is
         usually set only internally for performance optimization
+        :param server_side: whether to let the database copy the row (see _clone_server_side); unsaved changes of
+        this object are discarded then. Ignored where this is not supported.
         :return: returns a fresh clone of the original object (with adjusted relations)
         """
         if not self.pk:
@@ -1279,6 +2400,15 @@ class Versionable(models.Model):
 
         earlier_version = self
 
+        if server_side and not in_bulk and self._can_clone_server_side():
+            later_version = self._clone_server_side(forced_version_date)
+
+            # re-create ManyToMany relations
+            for field_name in self.get_all_m2m_field_names():
+                earlier_version.clone_relations(later_version, field_name, forced_version_date)
+
+            return later_version
+
         later_version = copy.copy(earlier_version)
         later_version.version_end_date = None
         later_version.version_start_date = forced_version_date
@@ -1303,6 +2433,103 @@ class Versionable(models.Model):
 
         return later_version
 
+    def _can_clone_server_side(self):
+        """
+        Checks whether this object can be cloned by the database itself (see _clone_server_side).
+
+        This is only the case if the database is PostgreSQL and the model's fields are all stored in a single table.
+
+        :return: boolean
+        """
+        if self._meta.parents:
+            return False
+        using = router.db_for_write(self.__class__, instance=self)
+        return connections[using].vendor == 'postgresql'
+
+    def _clone_server_side(self, forced_version_date):
+        """
+        WARNING: This method is only for internal use, it should not be used
+        from outside.
+
+        Clones this object with a single statement: the database copies the current row into a
+        historic version having a new id, and moves the start of the current row's validity period.
+        Only the resulting row is returned by the database, and used to refresh both this object
+        (which becomes the earlier version) and the later version.
+
+        Note that the historic version is copied from the database row; unsaved changes of this object
+        are not written to the database. No pre_save or post_save signals are sent.
+
+        :param forced_version_date: a timestamp including tzinfo
+        :return: the later version
+        """
+        using = router.db_for_write(self.__class__, instance=self)
+        connection = connections[using]
+        qn = connection.ops.quote_name
+        opts = self._meta
+        fields = opts.concrete_fields
+        table = qn(opts.db_table)
+        pk_column = qn(opts.pk.column)
+        start_column = qn(opts.get_field('version_start_date').column)
+        end_column = qn(opts.get_field('version_end_date').column)
+
+        earlier_id = self.uuid()
+        select_columns = []
+        for field in fields:
+            if field is opts.pk:
+                select_columns.append('%s')
+            elif field.name == 'version_end_date':
+                select_columns.append('%s')
+            else:
+                select_columns.append(qn(field.column))
+
+        sql = """
+            WITH earlier AS (
+                INSERT INTO {table} ({columns})
+                SELECT {select_columns} FROM {table} WHERE {pk} = %s AND {end} IS NULL
+                RETURNING {start}
+            )
+            UPDATE {table} SET {start} = %s FROM earlier WHERE {table}.{pk} = %s
+            RETURNING {returning}, earlier.{start}
+        """.format(
+            table=table,
+            columns=', '.join(qn(f.column) for f in fields),
+            select_columns=', '.join(select_columns),
+            pk=pk_column,
+            start=start_column,
+            end=end_column,
+            returning=', '.join('%s.%s' % (table, qn(f.column)) for f in fields),
+        )
+        pk_value = opts.pk.get_db_prep_value(self.pk, connection)
+        date_value = opts.get_field('version_start_date').get_db_prep_value(forced_version_date, connection)
+        params = []
+        for field in fields:
+            if field is opts.pk:
+                params.append(opts.pk.get_db_prep_value(earlier_id, connection))
+            elif field.name == 'version_end_date':
+                params.append(date_value)
+        params += [pk_value, date_value, pk_value]
+
+        cursor = connection.cursor()
+        try:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+        if row is None:
+            raise ValueError('No current version of this object exists in the database, it can not be cloned.')
+
+        later_version = copy.copy(self)
+        for field, value in zip(fields, row):
+            if hasattr(field, 'from_db_value'):
+                value = field.from_db_value(value, None, connection, {})
+            setattr(later_version, field.attname, value)
+            setattr(self, field.attname, value)
+
+        self.id = earlier_id
+        self.version_start_date = row[-1]
+        self.version_end_date = forced_version_date
+        return later_version
+
     def at(self, timestamp):
         """
         Force the create date of an object to be at a certain time; This method can be invoked only on a
@@ -1325,37 +2552,103 @@ class Versionable(models.Model):
         return self
 
     def clone_relations(self, clone, manager_field_name, forced_version_date):
+        """
+        Re-creates the ManyToMany relations of the given field (either a forward field or a related
+        descriptor) after this object has been cloned: the clone takes over the current relations and
+        the historic relations are pointing this object. This is done using a fixed number of statements,
+        whatever the number of relations is.
+
+        :param clone: the later version of this object
+        :param str manager_field_name: name of the ManyToMany field or descriptor
+        :param forced_version_date: the timestamp at which this object has been cloned
+        """
         # Source: the original object, where relations are currently pointing to
         source = getattr(self, manager_field_name)  # returns a VersionedRelatedManager instance
-        # Destination: the clone, where the cloned relations should point to
-        destination = getattr(clone, manager_field_name)
-        for item in source.all():
-            destination.add(item)
-
-        # retrieve all current m2m relations pointing the newly created clone
-        # filter for source_id
-        m2m_rels = list(source.through.objects.filter(**{source.source_field.attname: clone.id}))
-        later_current = []
-        later_non_current = []
-        for rel in m2m_rels:
-            # Only clone the relationship, if it is the current one; Simply adjust the older ones to point the old entry
-            # Otherwise, the number of pointers pointing an entry will grow exponentially
-            if rel.is_current:
-                later_current.append(rel.clone(forced_version_date=self.version_end_date, in_bulk=True))
-                # On rel, which is no more 'current', set the source ID to self.id
-                setattr(rel, source.source_field_name, self)
+        self._clone_relations_in_bulk(source.source_field, {clone.id: self.id}, forced_version_date)
+
+    @staticmethod
+    def _clone_relations_in_bulk(source_field, id_map, forced_version_date, using=None):
+        """
+        WARNING: This method is only for internal use, it should not be used
+        from outside.
+
+        Re-creates the many-to-many relations of a set of freshly cloned objects. Current relations are
+        taken over by the clones (and their earlier versions are inserted pointing the historic objects),
+        non-current relations are moved to the historic objects. This needs a constant number of
+        statements per chunk of objects, independently of the number of relations.
+
+        :param source_field: the through model's field pointing the cloned objects
+        :param dict id_map: maps the id of each clone (i.e. current version) to the id of its historic version
+        :param forced_version_date: the timestamp at which the objects have been cloned
+        :param str using: database alias to use
+        """
+        through = source_field.model
+        db = using or router.db_for_write(through)
+        clone_ids = list(id_map.keys())
+
+        for offset in range(0, len(clone_ids), GET_ITERATOR_CHUNK_SIZE):
+            chunk = clone_ids[offset:offset + GET_ITERATOR_CHUNK_SIZE]
+            source_filter = {'%s__in' % source_field.name: chunk}
+
+            # Insert the earlier versions of the current relations, pointing the historic objects
+            earlier_relations = []
+            for relation in through.objects.using(db).filter(version_end_date__isnull=True, **source_filter):
+                relation.id = Versionable.uuid()
+                relation.version_end_date = forced_version_date
+                setattr(relation, source_field.attname, id_map[getattr(relation, source_field.attname)])
+                earlier_relations.append(relation)
+
+            # Relations which are not current anymore belong to the history, so move them to the historic objects
+            non_current = through.objects.using(db).filter(version_end_date__isnull=False, **source_filter)
+            if VERSION[:2] >= (1, 8):
+                non_current.update(**{source_field.name: Case(
+                    *[When(then=Value(id_map[clone_id], output_field=source_field), **{source_field.name: clone_id})
+                      for clone_id in chunk],
+                    output_field=source_field
+                )})
             else:
-                later_non_current.append(rel)
-        # Perform the bulk changes rel.clone() did not perform because of the in_bulk parameter
-        # This saves a huge bunch of SQL queries:
-        # - update current version entries
-        source.through.objects.filter(id__in=[l.id for l in later_current]).update(
-            **{'version_start_date': forced_version_date})
-        # - update entries that have been pointing the current object, but have never been 'current'
-        source.through.objects.filter(id__in=[l.id for l in later_non_current]).update(
-            **{source.source_field_name: self})
-        # - create entries that were 'current', but which have been relieved in this method run
-        source.through.objects.bulk_create([r for r in m2m_rels if hasattr(r, '_not_created') and r._not_created])
+                Versionable._repoint_relations(source_field, {clone_id: id_map[clone_id] for clone_id in chunk}, db)
+
+            # The current relations keep their ids and now start with the clones
+            through.objects.using(db).filter(version_end_date__isnull=True, **source_filter).update(
+                version_start_date=forced_version_date)
+            through.objects.using(db)._bulk_insert(earlier_relations)
+
+    @staticmethod
+    def _repoint_relations(source_field, id_map, using):
+        """
+        WARNING: This method is only for internal use, it should not be used
+        from outside.
+
+        Moves the non-current relations pointing the keys of id_map to the corresponding values, using
+        a single UPDATE statement. Conditional expressions are not available before Django 1.8, so the
+        CASE expression is written out here.
+
+        :param source_field: the through model's field pointing the cloned objects
+        :param dict id_map: maps the currently pointed ids to the ids to point to
+        :param str using: database alias to use
+        """
+        connection = connections[using]
+        qn = connection.ops.quote_name
+        opts = source_field.model._meta
+        column = qn(source_field.column)
+        params = []
+        for old_id, new_id in id_map.items():
+            params.extend([source_field.get_db_prep_value(old_id, connection),
+                           source_field.get_db_prep_value(new_id, connection)])
+        params.extend(source_field.get_db_prep_value(old_id, connection) for old_id in id_map)
+        sql = "UPDATE {table} SET {column} = CASE {column} {whens} END " \
+              "WHERE {version_end_date} IS NOT NULL AND {column} IN ({ids})".format(
+                  table=qn(opts.db_table),
+                  column=column,
+                  whens=' '.join(['WHEN %s THEN %s'] * len(id_map)),
+                  version_end_date=qn(opts.get_field('version_end_date').column),
+                  ids=', '.join(['%s'] * len(id_map)))
+        cursor = connection.cursor()
+        try:
+            cursor.execute(sql, params)
+        finally:
+            cursor.close()
 
     def restore(self, **kwargs):
         """
@@ -1420,14 +2713,33 @@ class Versionable(models.Model):
 
             return restored
 
-    def get_all_m2m_field_names(self):
-        opts = self._meta
+    @classmethod
+    def get_all_m2m_field_names(cls):
+        opts = cls._meta
         rel_field_names = [field.attname for field in opts.many_to_many]
         if hasattr(opts, 'many_to_many_related'):
             rel_field_names += [rel.via_field_name for rel in opts.many_to_many_related]
 
         return rel_field_names
 
+    @classmethod
+    def _get_m2m_source_field(cls, field_name):
+        """
+        Gets the field of the intermediary model which points this model, for the given ManyToMany field
+        or related descriptor name (see get_all_m2m_field_names).
+
+        :param str field_name:
+        :return: a VersionedForeignKey of the intermediary model
+        """
+        descriptor = getattr(cls, field_name)
+        if isinstance(descriptor, VersionedManyRelatedObjectsDescriptor):
+            field = descriptor.related.field
+            source_field_name = field.m2m_reverse_field_name()
+        else:
+            field = descriptor.field
+            source_field_name = field.m2m_field_name()
+        return field.rel.through._meta.get_field(source_field_name)
+
     def detach(self):
         """
         Detaches the instance from its history.
@@ -1465,29 +2777,22 @@ class Versionable(models.Model):
 
 class VersionedManyToManyModel(object):
     """
-    This class is used for holding signal handlers required for proper versioning
+    This class used to hold the post_init signal handler initializing the versioning fields of new objects, which
+    is now done by Versionable.__init__.  It is not connected to any signal anymore.
+
+    Deprecated: it is only kept for backwards compatibility and will be removed in a future release.
     """
 
     @staticmethod
     def post_init_initialize(sender, instance, **kwargs):
         """
-        This is the signal handler post-initializing the intermediate many-to-many model.
+        Deprecated: new Versionable objects are initialized by Versionable.__init__.
         :param sender: The model class that just had an instance created.
         :param instance: The actual instance of the model that's just been created.
         :param kwargs: Required by Django definition
         :return: None
         """
+        warnings.warn("VersionedManyToManyModel is deprecated, Versionable objects are initialized by "
+                      "Versionable.__init__", DeprecationWarning, stacklevel=2)
         if isinstance(instance, sender) and isinstance(instance, Versionable):
-            ident = Versionable.uuid()
-            now = get_utc_now()
-            if not hasattr(instance, 'version_start_date') or instance.version_start_date is None:
-                instance.version_start_date = now
-            if not hasattr(instance, 'version_birth_date') or instance.version_birth_date is None:
-                instance.version_birth_date = now
-            if not hasattr(instance, 'id') or not bool(instance.id):
-                instance.id = ident
-            if not hasattr(instance, 'identity') or not bool(instance.identity):
-                instance.identity = ident
-
-
-post_init.connect(VersionedManyToManyModel.post_init_initialize)
+            instance._initialize_version_fields()
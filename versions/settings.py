@@ -18,7 +18,11 @@ def import_from_string(val, setting_name):
 
 _cache = {}
 _defaults = {
-    'VERSIONED_DELETE_COLLECTOR': 'versions.deletion.VersionedCollector'
+    'VERSIONED_DELETE_COLLECTOR': 'versions.deletion.VersionedCollector',
+    'VERSIONED_NATIVE_UUID': False,
+    'VERSIONED_PARTITIONED_MODELS': [],
+    'VERSIONED_VALIDITY_RANGE_MODELS': [],
+    'VERSIONED_ARCHIVED_MODELS': [],
 }
 
 def get_versioned_delete_collector_class():
@@ -0,0 +1,192 @@
+from django.core.exceptions import SuspiciousOperation
+from django.db import connections, router, transaction
+
+try:
+    from django.db.backends.utils import truncate_name
+except ImportError:
+    # Django 1.6
+    from django.db.backends.util import truncate_name
+
+from versions.models import QueryTime, VersionedForeignKey, VersionedQuerySet
+
+
+class Snapshot(object):
+    """
+    A snapshot materializes the state of a set of Versionable models at a point in time into snapshot tables.
+
+    Each model's versions valid at the snapshot's time are copied to a table of their own, which can then be
+    queried using a read-only QuerySet (see VersionManager.snapshot()). Since the snapshot tables contain nothing
+    but the valid versions, queries on them need no query time restriction, neither on the model's table nor on the
+    joins to other models of the same snapshot. Joins to models that are not part of the snapshot are restricted
+    to the snapshot's time as usual.
+
+    A snapshot of the current state (timestamp None) is refreshed incrementally; a snapshot of a point in time in the
+    past is rebuilt when it is refreshed.
+
+    Snapshot definitions are plain objects that can be created wherever needed, e.g.::
+
+        month_end = Snapshot('2015_01', [Team, Player], timestamp=datetime(2015, 1, 31, 23, 59, tzinfo=utc))
+        month_end.create()
+        Player.objects.snapshot(month_end).filter(team__name='Ice Hockey').count()
+    """
+
+    def __init__(self, name, models, timestamp=None):
+        """
+        :param str name: name of the snapshot, used to build the names of the snapshot tables
+        :param list models: Versionable models to include in the snapshot
+        :param datetime timestamp: point in time of the snapshot; None for the current state
+        """
+        self.name = name
+        self.models = list(models)
+        self.timestamp = timestamp
+
+    @property
+    def querytime(self):
+        return QueryTime(time=self.timestamp, active=True)
+
+    def table_name(self, model, connection):
+        """
+        Returns the name of the snapshot table for the given model.
+
+        :param model: Versionable model
+        :param connection: database connection
+        :return: str
+        """
+        return truncate_name('%s_snapshot_%s' % (model._meta.db_table, self.name), connection.ops.max_name_length())
+
+    def table_names(self, connection):
+        """
+        :return: dict mapping the models' table names to their snapshot table names
+        """
+        return dict((model._meta.db_table, self.table_name(model, connection)) for model in self.models)
+
+    def create(self, using=None):
+        """
+        Creates (or recreates, if they exist already) the snapshot tables, and indexes their primary key, identity
+        and VersionedForeignKey columns.
+
+        :param str using: database alias to use; if None, the router's write database for the first model is used
+        """
+        connection = self._connection(using)
+        qn = connection.ops.quote_name
+        with transaction.atomic(using=connection.alias):
+            cursor = connection.cursor()
+            try:
+                for model in self.models:
+                    table = self.table_name(model, connection)
+                    cursor.execute('DROP TABLE IF EXISTS %s' % qn(table))
+                    sql, params = self._versions_sql(model, connection)
+                    cursor.execute('CREATE TABLE %s AS %s' % (qn(table), sql), params)
+
+                    indexed_fields = [model._meta.pk, model._meta.get_field('identity')]
+                    indexed_fields += [f for f in model._meta.local_fields if isinstance(f, VersionedForeignKey)]
+                    for field in indexed_fields:
+                        index = truncate_name('%s_%s' % (table, field.column), connection.ops.max_name_length())
+                        cursor.execute('CREATE %sINDEX %s ON %s (%s)' % (
+                            'UNIQUE ' if field.primary_key else '', qn(index), qn(table), qn(field.column)))
+            finally:
+                cursor.close()
+
+    def refresh(self, using=None):
+        """
+        Brings the snapshot tables up to date.
+
+        For a snapshot of the current state, only the differences are written: rows of versions that are not
+        current anymore or that have been changed are deleted, and the missing current versions are inserted.
+        For a snapshot of a point in time in the past, the snapshot tables' contents are replaced.
+
+        :param str using: database alias to use; if None, the router's write database for the first model is used
+        :return: number of rows deleted and inserted
+        :rtype: int
+        """
+        connection = self._connection(using)
+        qn = connection.ops.quote_name
+        not_distinct = 'IS NOT DISTINCT FROM' if connection.vendor == 'postgresql' else 'IS'
+        changed_rows = 0
+        with transaction.atomic(using=connection.alias):
+            cursor = connection.cursor()
+            try:
+                for model in self.models:
+                    table = qn(self.table_name(model, connection))
+                    columns = [qn(f.column) for f in model._meta.local_concrete_fields]
+                    pk = qn(model._meta.pk.column)
+                    sql, params = self._versions_sql(model, connection)
+                    if self.timestamp is None:
+                        cursor.execute('DELETE FROM {table} WHERE NOT EXISTS ('
+                                       'SELECT 1 FROM ({sql}) versions WHERE {equal})'.format(
+                                           table=table, sql=sql,
+                                           equal=' AND '.join('versions.%s %s %s.%s' % (c, not_distinct, table, c)
+                                                              for c in columns)),
+                                       params)
+                        changed_rows += cursor.rowcount
+                        cursor.execute('INSERT INTO {table} ({columns}) SELECT {columns} FROM ({sql}) versions '
+                                       'WHERE versions.{pk} NOT IN (SELECT {pk} FROM {table})'.format(
+                                           table=table, columns=', '.join(columns), sql=sql, pk=pk),
+                                       params)
+                        changed_rows += cursor.rowcount
+                    else:
+                        cursor.execute('DELETE FROM %s' % table)
+                        changed_rows += cursor.rowcount
+                        cursor.execute('INSERT INTO %s (%s) %s' % (table, ', '.join(columns), sql), params)
+                        changed_rows += cursor.rowcount
+            finally:
+                cursor.close()
+        return changed_rows
+
+    def drop(self, using=None):
+        """
+        Drops the snapshot tables.
+
+        :param str using: database alias to use; if None, the router's write database for the first model is used
+        """
+        connection = self._connection(using)
+        qn = connection.ops.quote_name
+        cursor = connection.cursor()
+        try:
+            for model in self.models:
+                cursor.execute('DROP TABLE IF EXISTS %s' % qn(self.table_name(model, connection)))
+        finally:
+            cursor.close()
+
+    def queryset(self, model, using=None):
+        """
+        Returns a read-only QuerySet reading the given model's objects from the snapshot tables.
+        The objects have the snapshot's time as query time, so relations accessed on them are as of that time.
+
+        :param model: Versionable model included in the snapshot
+        :param str using: database alias to use
+        :return: SnapshotQuerySet
+        """
+        if model not in self.models:
+            raise ValueError("%s is not part of snapshot '%s'" % (model._meta.object_name, self.name))
+        queryset = SnapshotQuerySet(model=model, using=using)
+        queryset.query.snapshot_tables = self.table_names(connections[queryset.db])
+        queryset.querytime = self.querytime
+        return queryset
+
+    def _connection(self, using):
+        return connections[using or router.db_for_write(self.models[0])]
+
+    def _versions_sql(self, model, connection):
+        """
+        :return: tuple of the SQL selecting the model's local columns of the versions valid at the snapshot's time,
+            and its params
+        """
+        versions = model._default_manager.as_of(self.timestamp)
+        versions = versions.values_list(*[f.name for f in model._meta.local_concrete_fields]).order_by()
+        return versions.query.get_compiler(connection=connection).as_sql()
+
+
+class SnapshotQuerySet(VersionedQuerySet):
+    """
+    A read-only VersionedQuerySet reading its objects from snapshot tables. See Snapshot.
+    """
+
+    def _read_only(self, *args, **kwargs):
+        raise SuspiciousOperation("Snapshots are read-only")
+
+    update = delete = create = get_or_create = update_or_create = bulk_create = _read_only
+    clone_all = update_versioned = _read_only
+
+    def as_of(self, qtime=None):
+        raise SuspiciousOperation("The query time of a snapshot can not be changed")
@@ -0,0 +1,93 @@
+from __future__ import absolute_import
+import json
+
+from django.db import connections, transaction
+
+
+def explain(queryset):
+    """
+    Gets the query plan of the given QuerySet (including its query time restrictions) from the database.
+    Supported databases are PostgreSQL and SQLite.
+
+    :param queryset: QuerySet
+    :return: lines of the plan, as printed by EXPLAIN (PostgreSQL) or EXPLAIN QUERY PLAN (SQLite)
+    :rtype: list of str
+    """
+    connection = connections[queryset.db]
+    sql, params = queryset.query.get_compiler(connection=connection).as_sql()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('EXPLAIN ' + sql, params)
+            return [row[0] for row in cursor.fetchall()]
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def full_scans(queryset):
+    """
+    Gets the tables the database reads completely for running the given QuerySet, rather than looking up the rows
+    needed by an index: tables scanned sequentially, and indexes scanned without an index condition.
+
+    On PostgreSQL, the plan is made with sequential scans disabled, so that they are only planned for tables having
+    no index usable for the query.  Since PostgreSQL plans depend on the table statistics, the tables should contain
+    a representative amount of data, and should have been analyzed.  Note that PostgreSQL may scan a whole index
+    using a condition on a column that is not the index's first column; such scans are not detected.
+
+    :param queryset: QuerySet
+    :return: names of the tables read completely, in the order of the plan
+    :rtype: list of str
+    """
+    connection = connections[queryset.db]
+    sql, params = queryset.query.get_compiler(connection=connection).as_sql()
+    with transaction.atomic(using=connection.alias):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+                plan = cursor.fetchone()[0]
+                if not isinstance(plan, list):
+                    plan = json.loads(plan)
+                return _postgresql_full_scans(plan[0]['Plan'])
+
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            tables = []
+            for row in cursor.fetchall():
+                words = row[-1].split()
+                # e.g. 'SCAN versions_tests_player', 'SCAN TABLE versions_tests_player' (before SQLite 3.36)
+                # or 'SCAN versions_tests_player USING INDEX ...'; but not 'SCAN CONSTANT ROW'
+                if words[0] == 'SCAN' and words[1] != 'CONSTANT':
+                    tables.append(words[2] if words[1] == 'TABLE' else words[1])
+            return tables
+
+
+def _postgresql_full_scans(node, relation=None):
+    # Bitmap index scans are run for the table of the bitmap heap scan above them
+    relation = node.get('Relation Name', relation)
+    tables = []
+    if node['Node Type'] == 'Seq Scan' \
+            or (node['Node Type'] in ('Index Scan', 'Index Only Scan', 'Bitmap Index Scan')
+                and 'Index Cond' not in node):
+        tables.append(relation)
+    for child in node.get('Plans', []):
+        tables.extend(_postgresql_full_scans(child, relation))
+    return tables
+
+
+class IndexUsageTestMixin(object):
+    """
+    A mixin for TestCases checking that queries on Versionable models use indexes, e.g.::
+
+        class PlayerIndexTest(IndexUsageTestMixin, TestCase):
+            def test_as_of(self):
+                self.assertNoFullScans(Player.objects.as_of(t).filter(team__identity=team_identity))
+    """
+
+    def assertNoFullScans(self, queryset, msg=None):
+        """
+        Asserts that the database does not read any table completely for running the given QuerySet (see
+        full_scans).
+        """
+        tables = full_scans(queryset)
+        if tables:
+            standard_msg = 'Full scan of %s in the query plan:\n%s' % (', '.join(tables), '\n'.join(explain(queryset)))
+            self.fail(self._formatMessage(msg, standard_msg))
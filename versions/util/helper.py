@@ -1,13 +1,20 @@
 from __future__ import absolute_import
+from collections import namedtuple
+
 from django.db import connection, connections
 from django import VERSION
+try:
+    from django.db.backends.utils import truncate_name
+except ImportError:
+    # Django 1.6
+    from django.db.backends.util import truncate_name
 
 if VERSION >= (1, 7):
     from django.apps import apps
 else:
     from django.db.models import get_app, get_models
 
-from ..models import Versionable
+from ..models import Versionable, VersionedForeignKey
 
 def database_connection(dbname=None):
     if dbname:
@@ -23,4 +30,120 @@ def get_app_models(app_name, include_auto_created=False):
 
 
 def versionable_models(app_name, include_auto_created=False):
-    return [m for m in get_app_models(app_name, include_auto_created) if issubclass(m, Versionable)]
\ No newline at end of file
+    return [m for m in get_app_models(app_name, include_auto_created) if issubclass(m, Versionable)]
+
+
+class VersionIndex(namedtuple('VersionIndex', 'table name columns unique where')):
+    """
+    An index on the table of a Versionable model, as created by the index utilities of versions.util.postgresql and
+    versions.util.sqlite.  The columns are not quoted; where is the condition of a partial index, or ''.
+    """
+
+    def create_sql(self, connection):
+        """
+        :param connection: database connection
+        :return: the statement creating the index
+        :rtype: str
+        """
+        qn = connection.ops.quote_name
+        return 'CREATE %sINDEX %s ON %s (%s)%s' % ('UNIQUE ' if self.unique else '', qn(self.name), qn(self.table),
+                                                ', '.join(qn(column) for column in self.columns), self.where)
+
+
+CURRENT_VERSIONS = ' WHERE version_end_date IS NULL'
+
+
+def current_version_unique_indexes(app_name, connection):
+    """
+    Gets the partial unique indexes making the field groups listed in the VERSION_UNIQUE attributes of an
+    application's Versionable models unique among the current versions.
+
+    :param str app_name: application name
+    :param connection: database connection
+    :return: list of VersionIndex
+    """
+    indexes = []
+    for model in _indexed_models(app_name):
+        table_name = model._meta.db_table
+        for group in getattr(model, 'VERSION_UNIQUE', None) or []:
+            columns = [model._meta.get_field(field).column for field in group]
+            name = '%s_%s_%s_v_uniq' % (app_name, table_name, '_'.join(column[0:3] for column in columns))
+            indexes.append(VersionIndex(table_name, _truncated_by_database(name, connection), columns, True,
+                                        CURRENT_VERSIONS))
+    return indexes
+
+
+def current_version_unique_identity_indexes(app_name, connection):
+    """
+    Gets the partial unique indexes making the identity of an application's Versionable models unique among the
+    current versions.
+
+    :param str app_name: application name
+    :param connection: database connection
+    :return: list of VersionIndex
+    """
+    indexes = []
+    for model in _indexed_models(app_name):
+        table_name = model._meta.db_table
+        name = '%s_%s_identity_v_uniq' % (app_name, table_name)
+        indexes.append(VersionIndex(table_name, _truncated_by_database(name, connection), ['identity'], True,
+                                    CURRENT_VERSIONS))
+    return indexes
+
+
+def temporal_indexes(app_name, connection):
+    """
+    Gets the indexes used by query time restricted queries on the tables of an application's Versionable models,
+    including the auto-created tables of their many-to-many relationships:
+    - an index on (identity, version_start_date, version_end_date), used for finding the version of an object
+      valid at a point in time;
+    - partial indexes on each VersionedForeignKey column for the current versions, used when joining
+      the current versions of related objects.
+
+    :param str app_name: application name
+    :param connection: database connection
+    :return: list of VersionIndex
+    """
+    max_length = connection.ops.max_name_length()
+    indexes = []
+    for model in _indexed_models(app_name, include_auto_created=True):
+        table_name = model._meta.db_table
+        indexes.append(VersionIndex(table_name,
+                                    truncate_name('%s_%s_identity_v_temporal' % (app_name, table_name), max_length),
+                                    ['identity', 'version_start_date', 'version_end_date'], False, ''))
+        for field in model._meta.local_fields:
+            if isinstance(field, VersionedForeignKey):
+                name = '%s_%s_%s_v_current' % (app_name, table_name, field.column)
+                indexes.append(VersionIndex(table_name, truncate_name(name, max_length), [field.column], False,
+                                            CURRENT_VERSIONS))
+    return indexes
+
+
+def create_missing_indexes(connection, indexes, index_exists):
+    """
+    Creates the given indexes that do not exist in the database.
+
+    :param connection: database connection
+    :param list indexes: VersionIndex instances
+    :param index_exists: the backend's function checking whether an index exists, given a cursor and its name
+    :return: number of indexes created
+    :rtype: int
+    """
+    indexes_created = 0
+    with connection.cursor() as cursor:
+        for index in indexes:
+            if not index_exists(cursor, index.name):
+                cursor.execute(index.create_sql(connection))
+                indexes_created += 1
+    return indexes_created
+
+
+def _indexed_models(app_name, include_auto_created=False):
+    return [model for model in versionable_models(app_name, include_auto_created)
+            if not model._meta.proxy and getattr(model._meta, 'managed', True)]
+
+
+def _truncated_by_database(name, connection):
+    # The names of the unique indexes have always been left to be truncated by the database
+    max_length = connection.ops.max_name_length()
+    return name[:max_length] if max_length else name
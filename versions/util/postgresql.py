@@ -1,7 +1,18 @@
 from __future__ import absolute_import
-from django.db import connection as default_connection
-from versions.models import VersionedForeignKey
-from .helper import database_connection, versionable_models
+import re
+from collections import namedtuple
+
+from django.db import connection as default_connection, models, transaction
+from django.db.transaction import TransactionManagementError
+try:
+    from django.db.backends.utils import truncate_name
+except ImportError:
+    # Django 1.6
+    from django.db.backends.util import truncate_name
+from versions import settings as versions_settings
+from versions.models import Versionable, VersionedForeignKey, get_validity_range_models, partition_table_name
+from .helper import (create_missing_indexes, current_version_unique_identity_indexes, current_version_unique_indexes,
+                     database_connection, get_app_models, temporal_indexes, versionable_models)
 
 
 def index_exists(cursor, index_name):
@@ -103,29 +114,8 @@ def create_current_version_unique_indexes(app_name, database=None):
     :rtype: int
     """
 
-    indexes_created = 0
     connection = database_connection(database)
-    with connection.cursor() as cursor:
-        for model in versionable_models(app_name):
-            unique_field_groups = getattr(model, 'VERSION_UNIQUE', None)
-            if not unique_field_groups:
-                continue
-
-            table_name = model._meta.db_table
-            for group in unique_field_groups:
-                col_prefixes = []
-                columns = []
-                for field in group:
-                    column = model._meta.get_field(field).column
-                    col_prefixes.append(column[0:3])
-                    columns.append(column)
-                index_name = '%s_%s_%s_v_uniq' % (app_name, table_name, '_'.join(col_prefixes))
-                if not index_exists(cursor, index_name):
-                    cursor.execute("CREATE UNIQUE INDEX %s ON %s(%s) WHERE version_end_date IS NULL"
-                                   % (index_name, table_name, ','.join(columns)))
-                    indexes_created += 1
-
-    return indexes_created
+    return create_missing_indexes(connection, current_version_unique_indexes(app_name, connection), index_exists)
 
 def create_current_version_unique_identity_indexes(app_name, database=None):
     """
@@ -142,16 +132,479 @@ def create_current_version_unique_identity_indexes(app_name, database=None):
     :rtype: int
     """
 
-    indexes_created = 0
     connection = database_connection(database)
+    return create_missing_indexes(connection, current_version_unique_identity_indexes(app_name, connection),
+                                  index_exists)
+
+
+def create_temporal_indexes(app_name, database=None):
+    """
+    Add the indexes used by query time restricted queries to the tables of Versionable models, including the
+    auto-created tables of their many-to-many relationships:
+    - an index on (identity, version_start_date, version_end_date), used for finding the version of an object
+      valid at a point in time;
+    - partial indexes on each VersionedForeignKey column for the current versions, used when joining
+      the current versions of related objects.
+    This will only try to create indexes if they do not exist in the database, so it
+    should be safe to run in a post_migrate signal handler.  Running it several
+    times should leave the database in the same state as running it once.
+    :param str app_name: application name whose Versionable models will be acted on.
+    :param str database: database alias to use.  If None, use default connection.
+    :return: number of indexes created
+    :rtype: int
+    """
+
+    connection = database_connection(database)
+    return create_missing_indexes(connection, temporal_indexes(app_name, connection), index_exists)
+
+
+class IndexChange(namedtuple('IndexChange', 'action table index unique columns where')):
+    """
+    A change of an index planned by plan_index_adjustments: either the creation ('create') or the removal ('drop') of
+    the index with the given name.  For removals, only the table and the index name are set.
+    """
+
+    def sql(self, connection, concurrently=True):
+        """
+        :param connection: database connection
+        :param bool concurrently: whether the index is created or dropped without locking out writes to the table
+        :return: the statement applying the change
+        :rtype: str
+        """
+        qn = connection.ops.quote_name
+        if self.action == 'drop':
+            return 'DROP INDEX %s%s' % ('CONCURRENTLY ' if concurrently else '', qn(self.index))
+        return 'CREATE %sINDEX %s%s ON %s (%s)%s' % ('UNIQUE ' if self.unique else '',
+                                                   'CONCURRENTLY ' if concurrently else '',
+                                                   qn(self.index), qn(self.table),
+                                                   ', '.join(qn(column) for column in self.columns), self.where)
+
+
+def plan_index_adjustments(app_name, database=None):
+    """
+    Plan the index adjustments made by remove_uuid_id_like_indexes, create_current_version_unique_indexes,
+    create_current_version_unique_identity_indexes and create_temporal_indexes for an application, using a
+    single query on the catalog.  Indexes that exist but are invalid (e.g. left behind by a failed concurrent
+    build) are dropped and created again.  Partitioned tables (see partition_versions) are left alone, since
+    their indexes can not be built concurrently.
+    :param str app_name: application name whose Versionable models will be acted on.
+    :param str database: database alias to use.  If None, use default connection.
+    :return: the changes to apply, removals first
+    :rtype: list of IndexChange
+    """
+
+    connection = database_connection(database)
+    models_by_table = {}
+    for model in versionable_models(app_name, include_auto_created=True):
+        if not model._meta.proxy and getattr(model._meta, 'managed', True):
+            models_by_table[model._meta.db_table] = model
+
     with connection.cursor() as cursor:
-        for model in versionable_models(app_name):
-            if getattr(model._meta, 'managed', True):
-                table_name = model._meta.db_table
-                index_name = '%s_%s_identity_v_uniq' % (app_name, table_name)
-                if not index_exists(cursor, index_name):
-                    cursor.execute("CREATE UNIQUE INDEX %s ON %s(%s) WHERE version_end_date IS NULL"
-                                   % (index_name, table_name, 'identity'))
-                    indexes_created += 1
-
-    return indexes_created
+        cursor.execute("""
+            SELECT t.relname, i.relname, ix.indisvalid, array_agg(a.attname::text)
+            FROM pg_class t
+            LEFT JOIN pg_index ix ON ix.indrelid = t.oid
+            LEFT JOIN pg_class i ON i.oid = ix.indexrelid
+            LEFT JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = ANY(ix.indkey)
+            WHERE t.relkind = 'r' AND t.relname = ANY(%s) AND pg_table_is_visible(t.oid)
+            GROUP BY t.relname, i.relname, ix.indisvalid
+        """, [list(models_by_table)])
+        existing = {}
+        for table, index, valid, columns in cursor.fetchall():
+            existing.setdefault(table, {})
+            if index:
+                existing[table][index] = (valid, columns)
+
+    version_indexes = _version_indexes(app_name, connection)
+    drops = []
+    creates = []
+    for table in sorted(existing):
+        model = models_by_table[table]
+        indexes = existing[table]
+        uuid_columns = [f.column for f in model._meta.fields if isinstance(f, VersionedForeignKey)] + ['id']
+        for index, (valid, columns) in sorted(indexes.items()):
+            if index.endswith('_like') and set(columns) & set(uuid_columns):
+                drops.append(IndexChange('drop', table, index, False, None, None))
+
+        for change in version_indexes.get(table, []):
+            if change.index in indexes:
+                if indexes[change.index][0]:
+                    continue
+                drops.append(IndexChange('drop', table, change.index, False, None, None))
+            creates.append(change)
+
+    return drops + creates
+
+
+def _version_indexes(app_name, connection):
+    """
+    :return: dict mapping table names to the IndexChange instances creating the indexes the index adjustment
+        functions create on them
+    """
+    indexes = (current_version_unique_indexes(app_name, connection) +
+               current_version_unique_identity_indexes(app_name, connection) +
+               temporal_indexes(app_name, connection))
+    changes = {}
+    for index in indexes:
+        changes.setdefault(index.table, []).append(
+            IndexChange('create', index.table, index.name, index.unique, index.columns, index.where))
+    return changes
+
+
+def apply_index_plan(plan, database=None, concurrently=True, progress=None):
+    """
+    Apply index changes planned by plan_index_adjustments.
+    With concurrently=True, the indexes are created and dropped without locking out writes to their tables, which
+    takes longer and can not be done in a transaction; each statement is committed on its own.
+    :param list plan: IndexChange instances
+    :param str database: database alias to use.  If None, use default connection.
+    :param bool concurrently: whether to create and drop the indexes concurrently
+    :param progress: callable called with the number of the change, the number of changes and the change before
+        applying each change
+    :return: number of changes applied
+    :rtype: int
+    """
+
+    connection = database_connection(database)
+    if concurrently and connection.in_atomic_block:
+        raise TransactionManagementError("Indexes can not be created or dropped concurrently in a transaction")
+    with connection.cursor() as cursor:
+        for number, change in enumerate(plan, 1):
+            if progress:
+                progress(number, len(plan), change)
+            cursor.execute(change.sql(connection, concurrently))
+    return len(plan)
+
+
+def convert_uuid_columns_to_native(app_name, database=None, chunk_size=10000):
+    """
+    Convert the varchar columns holding UUIDs (the id and identity columns of Versionable models, and all foreign key
+    columns referencing Versionable models) of an application's tables to the native uuid type.
+    This is the migration to run for existing tables when enabling the VERSIONED_NATIVE_UUID setting.
+
+    The values are first copied to shadow columns in chunks, each chunk in its own transaction, so that the tables
+    stay usable while most of the data is converted.  Finally, in a single transaction, the rows changed in the
+    meantime are caught up, the shadow columns take the place of the original columns and the constraints and indexes
+    depending on them are recreated (except for the varchar_pattern_ops indexes, which do not apply to uuid columns).
+    All tables referencing the converted columns must belong to the given application.
+    Columns that already are of type uuid are left alone, so running it several times should leave the database in
+    the same state as running it once.
+    :param str app_name: application name whose models will be acted on.
+    :param str database: database alias to use.  If None, use default connection.
+    :param int chunk_size: number of rows converted per transaction
+    :return: number of columns converted
+    :rtype: int
+    """
+
+    connection = database_connection(database)
+    qn = connection.ops.quote_name
+    tables = []
+    with connection.cursor() as cursor:
+        for model in get_app_models(app_name, include_auto_created=True):
+            if model._meta.proxy or not getattr(model._meta, 'managed', True):
+                continue
+            columns = select_varchar_uuid_columns(model, cursor)
+            if columns:
+                tables.append((model, columns))
+
+    for model, columns in tables:
+        table = qn(model._meta.db_table)
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                for column, _ in columns:
+                    cursor.execute("ALTER TABLE %s ADD COLUMN %s uuid" % (table, qn(column + '__uuid')))
+
+        pk_column = qn(model._meta.pk.column)
+        assignments = ', '.join('%s = %s::uuid' % (qn(column + '__uuid'), qn(column)) for column, _ in columns)
+        last_pk = None
+        while True:
+            with transaction.atomic(using=connection.alias):
+                with connection.cursor() as cursor:
+                    cursor.execute("""
+                        WITH chunk AS (SELECT {pk} AS chunk_pk FROM {table} {where} ORDER BY {pk} LIMIT %s),
+                             updated AS (UPDATE {table} SET {assignments} FROM chunk WHERE {table}.{pk} = chunk.chunk_pk)
+                        SELECT max(chunk_pk) FROM chunk
+                    """.format(pk=pk_column, table=table, assignments=assignments,
+                               where='' if last_pk is None else 'WHERE %s > %%s' % pk_column),
+                        ([] if last_pk is None else [last_pk]) + [chunk_size])
+                    last_pk = cursor.fetchone()[0]
+            if last_pk is None:
+                break
+
+    with transaction.atomic(using=connection.alias):
+        with connection.cursor() as cursor:
+            constraints = {}
+            indexes = []
+            for model, columns in tables:
+                names = [column for column, _ in columns]
+                for row in select_constraints_on_columns(model, names, cursor):
+                    constraints[row[:2]] = row
+                indexes.extend(d for d in select_indexes_on_columns(model, names, cursor) if 'pattern_ops' not in d)
+
+            # Foreign keys must be dropped before the primary keys and unique constraints they reference
+            for table, name, _, _ in sorted(constraints.values(), key=lambda c: c[2] != 'f'):
+                cursor.execute("ALTER TABLE %s DROP CONSTRAINT %s" % (table, qn(name)))
+
+            for model, columns in tables:
+                table = qn(model._meta.db_table)
+                cursor.execute("UPDATE %s SET %s WHERE %s" % (
+                    table,
+                    ', '.join('%s = %s::uuid' % (qn(column + '__uuid'), qn(column)) for column, _ in columns),
+                    ' OR '.join('%s IS DISTINCT FROM %s::uuid' % (qn(column + '__uuid'), qn(column))
+                                for column, _ in columns)))
+                for column, nullable in columns:
+                    cursor.execute("ALTER TABLE %s DROP COLUMN %s" % (table, qn(column)))
+                    cursor.execute("ALTER TABLE %s RENAME COLUMN %s TO %s" % (table, qn(column + '__uuid'), qn(column)))
+                    if not nullable:
+                        cursor.execute("ALTER TABLE %s ALTER COLUMN %s SET NOT NULL" % (table, qn(column)))
+
+            # Primary keys and unique constraints must exist before the foreign keys referencing them
+            for table, name, contype, definition in sorted(constraints.values(), key=lambda c: c[2] == 'f'):
+                cursor.execute("ALTER TABLE %s ADD CONSTRAINT %s %s" % (table, qn(name), definition))
+            for definition in indexes:
+                cursor.execute(definition)
+
+    return sum(len(columns) for _, columns in tables)
+
+
+def partition_versions(app_name, database=None, drop_referencing_fks=False):
+    """
+    Split the tables of an application's Versionable models listed in the VERSIONED_PARTITIONED_MODELS setting into
+    a partition holding the current versions and one holding the historic versions.  Queries for current versions
+    then only read the (usually much smaller) current partition, named <table>_current.
+
+    The tables are converted to tables partitioned by the list of values of (version_end_date IS NULL), which
+    requires PostgreSQL 11 or later.  Rows are moved from the current to the historic partition by the database
+    when a version gets an end date.  Since a partitioned table can not have a unique constraint that does not
+    include the partition key, the primary key and the unique constraints and indexes are created on each partition
+    (the current partition keeping their names), and the foreign keys referencing the tables have to be dropped.
+    Since this can not be undone, a table referenced by foreign keys is only converted when drop_referencing_fks is
+    True; otherwise, a ValueError naming the foreign keys is raised.  Other indexes and foreign keys are recreated
+    on the partitioned tables.
+    Each table is converted in a transaction of its own, during which the table is locked.  Tables that already are
+    partitioned are left alone, so it should be safe to run in a post_migrate signal handler.  Running it several
+    times should leave the database in the same state as running it once.
+    :param str app_name: application name whose Versionable models will be acted on.
+    :param str database: database alias to use.  If None, use default connection.
+    :param bool drop_referencing_fks: whether to drop the foreign keys referencing the tables
+    :return: number of tables partitioned
+    :rtype: int
+    """
+
+    connection = database_connection(database)
+    qn = connection.ops.quote_name
+    partitioned_models = versions_settings.get_setting('VERSIONED_PARTITIONED_MODELS')
+    tables_partitioned = 0
+    for model in versionable_models(app_name):
+        if '%s.%s' % (model._meta.app_label, model._meta.object_name) not in partitioned_models:
+            continue
+        table = model._meta.db_table
+        current = partition_table_name(table, 'current', connection)
+        historic = partition_table_name(table, 'historic', connection)
+
+        def partition_names(name):
+            # The current partition's constraints and indexes keep the original names
+            return (current, name), (historic, partition_table_name(name, 'historic', connection))
+
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT relkind FROM pg_class WHERE oid = %s::regclass", [table])
+                if cursor.fetchone()[0] != 'r':
+                    continue
+                constraints = select_constraints_of_table(model, cursor)
+                cursor.execute("""
+                    SELECT pg_get_indexdef(i.indexrelid), i.indisunique, ic.relname FROM pg_index i
+                    JOIN pg_class ic ON ic.oid = i.indexrelid
+                    WHERE i.indrelid = %s::regclass
+                      AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid
+                                      AND c.conrelid = i.indrelid AND c.contype IN ('p', 'u', 'x'))
+                """, [table])
+                indexes = cursor.fetchall()
+
+                referencing_fks = [(constraint_table, name)
+                                   for constraint_table, name, contype, definition, referencing in constraints
+                                   if referencing]
+                if referencing_fks and not drop_referencing_fks:
+                    raise ValueError("%s is referenced by the foreign keys %s, which would have to be dropped" % (
+                        table, ', '.join('%s.%s' % fk for fk in referencing_fks)))
+                for constraint_table, name in referencing_fks:
+                    cursor.execute("ALTER TABLE %s DROP CONSTRAINT %s" % (constraint_table, qn(name)))
+
+                unpartitioned = qn(table + '__unpartitioned')
+                cursor.execute("ALTER TABLE %s RENAME TO %s" % (qn(table), unpartitioned))
+                cursor.execute("CREATE TABLE %s (LIKE %s INCLUDING DEFAULTS INCLUDING CONSTRAINTS%s) "
+                               "PARTITION BY LIST ((version_end_date IS NULL))" % (
+                                   qn(table), unpartitioned,
+                                   # e.g. the version_validity column (see add_validity_ranges)
+                                   ' INCLUDING GENERATED' if connection.pg_version >= 120000 else ''))
+                cursor.execute("CREATE TABLE %s PARTITION OF %s FOR VALUES IN (TRUE)" % (qn(current), qn(table)))
+                cursor.execute("CREATE TABLE %s PARTITION OF %s FOR VALUES IN (FALSE)" % (qn(historic), qn(table)))
+                columns = ', '.join(qn(f.column) for f in model._meta.local_concrete_fields)
+                cursor.execute("INSERT INTO %s (%s) SELECT %s FROM %s" % (qn(table), columns, columns, unpartitioned))
+                cursor.execute("DROP TABLE %s" % unpartitioned)
+
+                for _, name, contype, definition, referencing in constraints:
+                    if contype in ('p', 'u', 'x'):
+                        for partition, partition_name in partition_names(name):
+                            cursor.execute("ALTER TABLE %s ADD CONSTRAINT %s %s" % (
+                                qn(partition), qn(partition_name), definition))
+                    elif contype == 'f' and not referencing:
+                        cursor.execute("ALTER TABLE %s ADD CONSTRAINT %s %s" % (qn(table), qn(name), definition))
+                for definition, unique, name in indexes:
+                    if not unique:
+                        cursor.execute(definition)
+                        continue
+                    for partition, partition_name in partition_names(name):
+                        cursor.execute(re.sub(r'^CREATE UNIQUE INDEX \S+ ON \S+ ',
+                                              'CREATE UNIQUE INDEX %s ON %s ' % (qn(partition_name), qn(partition)),
+                                              definition))
+                tables_partitioned += 1
+
+    return tables_partitioned
+
+
+def add_validity_ranges(app_name, database=None, exclusion_constraints=True):
+    """
+    Add a version_validity column of type tstzrange, holding the range [version_start_date, version_end_date), to the
+    tables of an application's Versionable models listed in the VERSIONED_VALIDITY_RANGE_MODELS setting, including
+    the auto-created tables of their many-to-many relationships.  Query time restrictions to a point in time on these
+    tables are compiled to a containment test on this column, so this is the migration to run before listing the
+    models in the setting.
+
+    The column is a generated column maintained by the database, which requires PostgreSQL 12 or later.  It is
+    indexed using GiST, and backs an exclusion constraint forbidding overlapping versions of the same object
+    (which requires the btree_gist extension, created if missing).  The exclusion constraint is deferred to the end
+    of the transaction, since clone() ends the validity of the previous version after starting the new one.
+    Partitioned tables (see partition_versions) can not have the exclusion constraint.
+    This will only try to create columns, indexes and constraints if they do not exist in the database, so it
+    should be safe to run in a post_migrate signal handler.  Running it several times should leave the database in
+    the same state as running it once.
+    :param str app_name: application name whose Versionable models will be acted on.
+    :param str database: database alias to use.  If None, use default connection.
+    :param bool exclusion_constraints: whether to create the exclusion constraints (e.g. False if the btree_gist
+        extension is not available)
+    :return: number of columns added
+    :rtype: int
+    """
+
+    columns_added = 0
+    connection = database_connection(database)
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        if exclusion_constraints:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+        for model in versionable_models(app_name, include_auto_created=True):
+            if model._meta.proxy or not getattr(model._meta, 'managed', True) \
+                    or model not in get_validity_range_models():
+                continue
+            table_name = model._meta.db_table
+            cursor.execute("SELECT COUNT(1) FROM information_schema.columns "
+                           "WHERE table_name = %s AND column_name = 'version_validity'", [table_name])
+            if not cursor.fetchone()[0]:
+                cursor.execute("ALTER TABLE %s ADD COLUMN version_validity tstzrange GENERATED ALWAYS AS "
+                               "(tstzrange(version_start_date, version_end_date, '[)')) STORED" % qn(table_name))
+                columns_added += 1
+
+            index_name = truncate_name('%s_%s_validity_v_gist' % (app_name, table_name),
+                                       connection.ops.max_name_length())
+            if not index_exists(cursor, index_name):
+                cursor.execute("CREATE INDEX %s ON %s USING gist (version_validity)" % (
+                    qn(index_name), qn(table_name)))
+
+            constraint_name = truncate_name('%s_%s_identity_v_excl' % (app_name, table_name),
+                                            connection.ops.max_name_length())
+            cursor.execute("SELECT relkind = 'p' OR EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = pg_class.oid "
+                           "AND conname = %s) FROM pg_class WHERE oid = %s::regclass", [constraint_name, table_name])
+            if exclusion_constraints and not cursor.fetchone()[0]:
+                cursor.execute("ALTER TABLE %s ADD CONSTRAINT %s EXCLUDE USING gist "
+                               "(identity WITH =, version_validity WITH &&) DEFERRABLE INITIALLY DEFERRED" % (
+                                   qn(table_name), qn(constraint_name)))
+
+    return columns_added
+
+
+def select_constraints_of_table(model, cursor):
+    """
+    Gets the constraints of the given model's table that are not inherited, together with the foreign keys
+    referencing it.
+
+    :param model: Django model
+    :param cursor: database connection cursor
+    :return: list of (quoted table name, constraint name, constraint type, definition, is referencing) tuples
+    """
+    table = model._meta.db_table
+    cursor.execute("""
+        SELECT c.conrelid::regclass::text, c.conname, c.contype, pg_get_constraintdef(c.oid),
+               c.confrelid = %s::regclass
+        FROM pg_constraint c
+        WHERE (c.conrelid = %s::regclass OR c.confrelid = %s::regclass) AND c.conparentid = 0
+    """, [table, table, table])
+    return [tuple(row) for row in cursor.fetchall()]
+
+
+def select_varchar_uuid_columns(model, cursor):
+    """
+    Gets the columns of the given model's table that hold UUIDs and are still of a varchar type.
+
+    :param model: Django model
+    :param cursor: database connection cursor
+    :return: list of (column name, nullable) tuples
+    """
+    column_names = []
+    for field in model._meta.local_fields:
+        if issubclass(model, Versionable) and field.name in ('id', 'identity'):
+            column_names.append(field.column)
+        elif isinstance(field, models.ForeignKey) and issubclass(field.rel.to, Versionable):
+            column_names.append(field.column)
+    if not column_names:
+        return []
+
+    cursor.execute("""
+        SELECT column_name, is_nullable = 'YES' FROM information_schema.columns
+        WHERE table_name = %s AND column_name = ANY(%s) AND data_type = 'character varying'
+        ORDER BY ordinal_position
+    """, [model._meta.db_table, column_names])
+    return cursor.fetchall()
+
+
+def select_constraints_on_columns(model, column_names, cursor):
+    """
+    Gets the constraints defined on the given columns of the model's table, including the foreign keys of other
+    tables referencing them.
+
+    :param model: Django model
+    :param column_names: list of column names
+    :param cursor: database connection cursor
+    :return: list of (quoted table name, constraint name, constraint type, definition) tuples
+    """
+    table = model._meta.db_table
+    cursor.execute("""
+        WITH cols AS (SELECT array_agg(attnum) AS attnums FROM pg_attribute
+                      WHERE attrelid = %s::regclass AND attname = ANY(%s))
+        SELECT c.conrelid::regclass::text, c.conname, c.contype, pg_get_constraintdef(c.oid)
+        FROM pg_constraint c, cols
+        WHERE (c.conrelid = %s::regclass AND c.conkey && cols.attnums)
+           OR (c.confrelid = %s::regclass AND c.confkey && cols.attnums)
+    """, [table, column_names, table, table])
+    return [tuple(row) for row in cursor.fetchall()]
+
+
+def select_indexes_on_columns(model, column_names, cursor):
+    """
+    Gets the definitions of the indexes on the given columns of the model's table that do not back a constraint.
+
+    :param model: Django model
+    :param column_names: list of column names
+    :param cursor: database connection cursor
+    :return: list of CREATE INDEX statements
+    """
+    table = model._meta.db_table
+    cursor.execute("""
+        SELECT pg_get_indexdef(i.indexrelid) FROM pg_index i
+        WHERE i.indrelid = %s::regclass
+          AND i.indkey::int2[] && ARRAY(SELECT attnum FROM pg_attribute
+                                        WHERE attrelid = %s::regclass AND attname = ANY(%s))
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint c
+                          WHERE c.conindid = i.indexrelid AND c.contype IN ('p', 'u', 'x'))
+    """, [table, table, column_names])
+    return [row[0] for row in cursor.fetchall()]
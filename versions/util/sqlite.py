@@ -0,0 +1,73 @@
+from __future__ import absolute_import
+from .helper import (create_missing_indexes, current_version_unique_identity_indexes, current_version_unique_indexes,
+                     database_connection, temporal_indexes)
+
+
+def index_exists(cursor, index_name):
+    """
+    Checks if an index with the given name exists in the database
+
+    :param cursor: database connection cursor
+    :param index_name: string
+    :return: boolean
+    """
+    cursor.execute("SELECT COUNT(1) FROM sqlite_master WHERE type = 'index' AND name = %s", [index_name])
+    return cursor.fetchone()[0] > 0
+
+
+def create_current_version_unique_indexes(app_name, database=None):
+    """
+    Add unique indexes for models which have a VERSION_UNIQUE attribute.
+    These must be defined as partially unique indexes (supported by SQLite 3.8.0 and later),
+    which django does not support.
+    The unique indexes are defined so that no two *current* versions can have
+    the same value.
+    This will only try to create indexes if they do not exist in the database, so it
+    should be safe to run in a post_migrate signal handler.  Running it several
+    times should leave the database in the same state as running it once.
+    :param str app_name: application name whose Versionable models will be acted on.
+    :param str database: database alias to use.  If None, use default connection.
+    :return: number of partial unique indexes created
+    :rtype: int
+    """
+
+    connection = database_connection(database)
+    return create_missing_indexes(connection, current_version_unique_indexes(app_name, connection), index_exists)
+
+
+def create_current_version_unique_identity_indexes(app_name, database=None):
+    """
+    Add partial unique indexes for the the identity column of versionable models.
+
+    This enforces that no two *current* versions can have the same identity.
+
+    This will only try to create indexes if they do not exist in the database, so it
+    should be safe to run in a post_migrate signal handler.  Running it several
+    times should leave the database in the same state as running it once.
+    :param str app_name: application name whose Versionable models will be acted on.
+    :param str database: database alias to use.  If None, use default connection.
+    :return: number of partial unique indexes created
+    :rtype: int
+    """
+
+    connection = database_connection(database)
+    return create_missing_indexes(connection, current_version_unique_identity_indexes(app_name, connection),
+                                  index_exists)
+
+
+def create_temporal_indexes(app_name, database=None):
+    """
+    Add the indexes used by query time restricted queries to the tables of Versionable models, including the
+    auto-created tables of their many-to-many relationships.  These are the same indexes as the ones created
+    by versions.util.postgresql.create_temporal_indexes.
+    This will only try to create indexes if they do not exist in the database, so it
+    should be safe to run in a post_migrate signal handler.  Running it several
+    times should leave the database in the same state as running it once.
+    :param str app_name: application name whose Versionable models will be acted on.
+    :param str database: database alias to use.  If None, use default connection.
+    :return: number of indexes created
+    :rtype: int
+    """
+
+    connection = database_connection(database)
+    return create_missing_indexes(connection, temporal_indexes(app_name, connection), index_exists)
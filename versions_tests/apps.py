@@ -4,8 +4,9 @@ from django.db import connection
 
 def index_adjustments(sender, using=None, **kwargs):
     """
-    Remove -like indexes (varchar_pattern_ops) on UUID fields and create
-    version-unique indexes for models that have a VERSION_UNIQUE attribute.
+    Remove -like indexes (varchar_pattern_ops) on UUID fields, create
+    version-unique indexes for models that have a VERSION_UNIQUE attribute
+    and create the indexes used by query time restricted queries.
     :param AppConfig sender:
     :param str sender: database alias
     :param kwargs:
@@ -13,11 +14,30 @@ def index_adjustments(sender, using=None, **kwargs):
     from versions.util.postgresql import (
         remove_uuid_id_like_indexes,
         create_current_version_unique_indexes,
-        create_current_version_unique_identity_indexes
+        create_current_version_unique_identity_indexes,
+        create_temporal_indexes
     )
     remove_uuid_id_like_indexes(sender.name, using)
     create_current_version_unique_indexes(sender.name, using)
     create_current_version_unique_identity_indexes(sender.name, using)
+    create_temporal_indexes(sender.name, using)
+
+def sqlite_index_adjustments(sender, using=None, **kwargs):
+    """
+    Create version-unique indexes for models that have a VERSION_UNIQUE attribute
+    and the indexes used by query time restricted queries.
+    :param AppConfig sender:
+    :param str sender: database alias
+    :param kwargs:
+    """
+    from versions.util.sqlite import (
+        create_current_version_unique_indexes,
+        create_current_version_unique_identity_indexes,
+        create_temporal_indexes
+    )
+    create_current_version_unique_indexes(sender.name, using)
+    create_current_version_unique_identity_indexes(sender.name, using)
+    create_temporal_indexes(sender.name, using)
 
 class VersionsTestsConfig(AppConfig):
     name = 'versions_tests'
@@ -25,12 +45,15 @@ class VersionsTestsConfig(AppConfig):
 
     def ready(self):
         """
-        For postgresql only, remove like indexes for uuid columns and
-        create version-unique indexes.
+        For postgresql, remove like indexes for uuid columns and
+        create version-unique and temporal indexes. For sqlite, create
+        version-unique and temporal indexes.
 
         This will only be run in django >= 1.7.
 
         :return: None
         """
         if connection.vendor == 'postgresql':
-            post_migrate.connect(index_adjustments, sender=self)
\ No newline at end of file
+            post_migrate.connect(index_adjustments, sender=self)
+        elif connection.vendor == 'sqlite':
+            post_migrate.connect(sqlite_index_adjustments, sender=self)
\ No newline at end of file
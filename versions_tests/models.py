@@ -61,6 +61,16 @@ class Award(Versionable):
     players = VersionedManyToManyField(Player, related_name='awards')
 
 
+############################################
+# Models for
+# - SnapshotTest
+# - PostgresqlPartitionedVersionsTest
+# The plain ForeignKey points a specific (possibly historic) version of the player
+class Transfer(Versionable):
+    name = CharField(max_length=200)
+    player = ForeignKey(Player, related_name='transfers', on_delete=DO_NOTHING)
+
+
 @python_2_unicode_compatible
 class Mascot(Versionable):
     name = CharField(max_length=200)
@@ -265,3 +275,22 @@ class WineDrinkerHat(Model):
 class Person(Versionable):
     name = CharField(max_length=200)
     children = VersionedManyToManyField('self', symmetrical=False, null=True, related_name='parents')
+
+
+############################################
+# Models using multi-table inheritance, which the set-based operations of the VersionedQuerySet refuse
+# - CloneAllTest
+# - UpdateVersionedTest
+class Vehicle(Versionable):
+    name = CharField(max_length=200)
+
+
+class Car(Vehicle):
+    seats = IntegerField(default=4)
+
+    class Meta:
+        # The unique_together of Versionable refers to the parent's fields
+        unique_together = ()
+        # The versioning columns are in the parent's table, which the index utilities run on post_migrate do not
+        # expect; the tests do not need the table
+        managed = False
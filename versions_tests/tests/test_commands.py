@@ -1,6 +1,16 @@
+from unittest import skipIf, skipUnless
+
 import django
 from django.core.management import call_command
-from django.test import TestCase
+from django.db import connection, transaction
+from django.db.transaction import TransactionManagementError
+from django.test import TestCase, TransactionTestCase
+from django.utils import six
+
+from versions import settings as versions_settings
+from versions.util.postgresql import (apply_index_plan, create_current_version_unique_indexes,
+                                      get_uuid_like_indexes_on_table, index_exists, plan_index_adjustments)
+from versions_tests.models import Player
 
 APP_NAME = 'versions_tests'
 
@@ -8,3 +18,79 @@ if django.VERSION[:2] >= (1, 7):
     class TestMigrations(TestCase):
         def test_makemigrations_command(self):
             call_command('makemigrations', APP_NAME, dry_run=True, verbosity=0)
+
+
+@skipUnless(django.VERSION[:2] >= (1, 7) and connection.vendor == 'postgresql',
+            "Postgresql-specific test requiring the indexes created on migration")
+class AdjustVersionIndexesTest(TransactionTestCase):
+    index_name = 'versions_tests_versions_tests_player_team_id_v_current'
+
+    def tearDown(self):
+        # Leave the indexes as the post_migrate handler created them
+        apply_index_plan(plan_index_adjustments(APP_NAME))
+
+    def test_plan(self):
+        # The indexes have been created by the post_migrate handler in versions_tests.apps.VersionsTestsConfig.ready
+        self.assertEqual([], plan_index_adjustments(APP_NAME))
+
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX "%s"' % self.index_name)
+        self.assertEqual([('create', 'versions_tests_player', self.index_name)],
+                         [change[:3] for change in plan_index_adjustments(APP_NAME)])
+
+    def test_plan_matches_the_created_indexes(self):
+        index_name = 'versions_tests_versions_tests_chainstore_sub_cit_nam_v_uniq'
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX "%s"' % index_name)
+        plan = plan_index_adjustments(APP_NAME)
+        self.assertEqual(['CREATE UNIQUE INDEX "%s" ON "versions_tests_chainstore" ("subchain_id", "city", "name") '
+                          'WHERE version_end_date IS NULL' % index_name],
+                         [change.sql(connection, concurrently=False) for change in plan])
+        apply_index_plan(plan, concurrently=False)
+        self.assertEqual(0, create_current_version_unique_indexes(APP_NAME))
+
+    @skipIf(versions_settings.get_setting('VERSIONED_NATIVE_UUID'), "Native uuid columns have no like indexes")
+    def test_plan_drops_like_indexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE INDEX "versions_tests_player_id_like" ON "versions_tests_player" '
+                           '("id" varchar_pattern_ops)')
+        self.assertEqual([('drop', 'versions_tests_player', 'versions_tests_player_id_like')],
+                         [change[:3] for change in plan_index_adjustments(APP_NAME)])
+
+    @skipUnless(versions_settings.get_setting('VERSIONED_NATIVE_UUID'), "Run with the native UUID settings")
+    def test_no_like_indexes_on_native_uuid_columns(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT data_type FROM information_schema.columns "
+                           "WHERE table_name = 'versions_tests_player' AND column_name = 'id'")
+            self.assertEqual('uuid', cursor.fetchone()[0])
+        # Django does not create like indexes for uuid columns, so there is nothing to drop
+        self.assertEqual([], get_uuid_like_indexes_on_table(Player))
+        self.assertEqual([], plan_index_adjustments(APP_NAME))
+
+    def test_dry_run(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX "%s"' % self.index_name)
+        out = six.StringIO()
+        call_command('adjust_version_indexes', APP_NAME, dry_run=True, stdout=out)
+        self.assertEqual('CREATE INDEX CONCURRENTLY "%s" ON "versions_tests_player" ("team_id") '
+                         'WHERE version_end_date IS NULL;\n' % self.index_name, out.getvalue())
+        with connection.cursor() as cursor:
+            self.assertFalse(index_exists(cursor, self.index_name))
+
+    def test_adjust_version_indexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX "%s"' % self.index_name)
+        out = six.StringIO()
+        call_command('adjust_version_indexes', APP_NAME, stdout=out)
+        self.assertIn('[1/1] CREATE INDEX CONCURRENTLY', out.getvalue())
+        with connection.cursor() as cursor:
+            self.assertTrue(index_exists(cursor, self.index_name))
+
+        out = six.StringIO()
+        call_command('adjust_version_indexes', APP_NAME, stdout=out)
+        self.assertEqual('No index adjustments needed\n', out.getvalue())
+
+    def test_concurrently_in_transaction(self):
+        with self.assertRaises(TransactionManagementError):
+            with transaction.atomic():
+                apply_index_plan(plan_index_adjustments(APP_NAME))
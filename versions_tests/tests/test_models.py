@@ -18,22 +18,31 @@ import itertools
 from unittest import skip, skipUnless
 import re
 import uuid
+import warnings
 
 from django import get_version
 from django.core.exceptions import SuspiciousOperation, ObjectDoesNotExist, ValidationError
 from django.db import connection, IntegrityError, transaction
-from django.db.models import Q, Count, Sum
+from django.db.models import F, Q, Count, Sum
 from django.db.models.deletion import ProtectedError
-from django.test import TestCase
+from django.db.models.query import prefetch_related_objects
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import override_settings
 from django.utils.timezone import utc
 from django.utils import six
 from django import VERSION
 
+from versions import settings as versions_settings
+from versions.deletion import VersionedCollector
 from versions.exceptions import DeletionOfNonCurrentVersionError
-from versions.models import get_utc_now, ForeignKeyRequiresValueError, Versionable
+from versions.models import get_utc_now, ForeignKeyRequiresValueError, Versionable, VersionedManyToManyModel
+from versions.archive import archive_versions
+from versions.util.postgresql import add_validity_ranges
+from versions.snapshots import Snapshot
 from versions_tests.models import (
-    Award, B, C1, C2, C3, City, Classroom, Directory, Fan, Mascot, NonFan, Observer, Person, Player, Professor, Pupil,
-    RabidFan, Student, Subject, Teacher, Team, Wine, WineDrinker, WineDrinkerHat, WizardFan
+    Award, B, C1, C2, C3, Car, ChainStore, City, Classroom, Color, Directory, Fan, Mascot, NonFan, Observer, Person,
+    Player, Professor, Pupil, RabidFan, Student, Subject, Teacher, Team, Transfer, Wine, WineDrinker, WineDrinkerHat,
+    WizardFan
 )
 
 
@@ -115,6 +124,29 @@ class CreationTest(TestCase):
         self.assertTrue(isinstance(b_new, Versionable))
         self.assertEqual(b_new.version_start_date, b.version_end_date)
 
+    def test_versioning_fields_initialized_by_constructor(self):
+        b = B(name='someB')
+        self.assertTrue(B.objects.validate_uuid(b.id))
+        self.assertEqual(b.id, b.identity)
+        self.assertIsNotNone(b.version_start_date)
+        self.assertEqual(b.version_start_date, b.version_birth_date)
+        self.assertIsNone(b.version_end_date)
+
+        b.save()
+        # Loading objects with deferred fields does not load these fields
+        with self.assertNumQueries(1):
+            b_deferred = B.objects.current.only('id', 'name').get(pk=b.pk)
+            self.assertEqual(b.pk, b_deferred.id)
+
+    def test_deprecated_post_init_handler(self):
+        b = B(name='someB')
+        b.identity = None
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            VersionedManyToManyModel.post_init_initialize(B, b)
+        self.assertEqual([DeprecationWarning], [w.category for w in caught])
+        self.assertEqual(b.id, b.identity)
+
     def test_full_clean(self):
         """
         A full clean will fail if some field allows null but not blank, and
@@ -127,6 +159,50 @@ class CreationTest(TestCase):
             self.fail("Full clean did not succeed")
 
 
+class BulkCreateTest(TestCase):
+    def test_bulk_create(self):
+        with self.assertNumQueries(1):
+            bs = B.objects.bulk_create([B(name='b{}'.format(i)) for i in range(10)])
+        self.assertEqual(10, len(bs))
+        self.assertEqual(10, len({b.id for b in bs}))
+        self.assertEqual(1, len({b.version_start_date for b in bs}))
+        for b in bs:
+            self.assertTrue(b.is_latest)
+            self.assertEqual(b.version_start_date, b.version_birth_date)
+            self.assertTrue(B.objects.validate_uuid(b.id))
+        self.assertEqual(10, B.objects.current.filter(name__startswith='b').count())
+
+        b = B.objects.current.get(name='b0').clone()
+        self.assertEqual(bs[0].version_start_date, b.version_birth_date)
+
+    def test_bulk_create_with_uuid(self):
+        b_id = six.text_type(uuid.uuid4())
+        identity = six.text_type(uuid.uuid4())
+        bs = B.objects.bulk_create([B(name='b0', id=b_id), B(name='b1', id=uuid.uuid4(), identity=identity)])
+        self.assertEqual(b_id, six.text_type(bs[0].id))
+        self.assertEqual(b_id, six.text_type(B.objects.current.get(name='b0').identity))
+        self.assertEqual(identity, six.text_type(B.objects.current.get(name='b1').identity))
+
+        with self.assertRaises(ValueError):
+            B.objects.bulk_create([B(name='b2', id=six.text_type(uuid.uuid5(uuid.NAMESPACE_OID, 'bar')))])
+        self.assertEqual(0, B.objects.filter(name='b2').count())
+
+    def test_bulk_create_at(self):
+        t = datetime.datetime(1980, 1, 1, tzinfo=utc)
+        B.objects.bulk_create((B(name='b{}'.format(i)) for i in range(200)), timestamp=t, batch_size=50)
+        self.assertEqual(200, B.objects.as_of(t).count())
+        self.assertEqual(0, B.objects.as_of(t - datetime.timedelta(seconds=1)).count())
+
+    def test_bulk_create_on_queryset(self):
+        bs = B.objects.using('default').bulk_create([B(name='b0'), B(name='b1')])
+        bs += B.objects.current.filter(name='b0').bulk_create([B(name='b2')])
+        for b in bs:
+            self.assertEqual(b.id, b.identity)
+            self.assertIsNotNone(b.version_start_date)
+            self.assertEqual(b.version_start_date, b.version_birth_date)
+        self.assertEqual(['b0', 'b1', 'b2'], sorted(B.objects.current.values_list('name', flat=True)))
+
+
 class DeletionTest(TestCase):
     def setUp(self):
         self.b, self.t1, self.t2, self.t3 = set_up_one_object_with_3_versions()
@@ -283,6 +359,74 @@ class DeletionHandlerTest(TestCase):
         self.assertEqual(1, through.objects.filter(player_id=p1.pk).count())
         self.assertEqual(0, through.objects.current.filter(player_id=p1.pk).count())
 
+    def test_delete_in_batches(self):
+        def delete_team_with_players(number_of_players):
+            team = Team.objects.create(name='team')
+            players = [Player.objects.create(name='p{}'.format(i), team=team) for i in range(number_of_players)]
+            self.a1.players.add(*players)
+            with self.assertNumQueries(9):
+                team.delete()
+            self.assertEqual(0, Player.objects.current.filter(team__identity=team.identity).count())
+            self.assertEqual(number_of_players, Player.objects.filter(team__identity=team.identity).count())
+
+        # The number of queries does not depend on the number of deleted objects
+        delete_team_with_players(2)
+        delete_team_with_players(20)
+
+    def test_set_on_delete_in_batches(self):
+        def delete_team_with_fans(number_of_fans):
+            team = Team.objects.create(name='team')
+            fans = [Fan.objects.create(name='f{}'.format(i), team=team) for i in range(number_of_fans)]
+            rabid_fans = [RabidFan.objects.create(name='rf{}'.format(i), team=team) for i in range(number_of_fans)]
+            t1 = get_utc_now()
+            with self.assertNumQueries(15):
+                team.delete()
+            self.assertEqual({self.default_team}, {f.team for f in Fan.objects.current.filter(
+                identity__in=[f.identity for f in fans])})
+            self.assertEqual(number_of_fans, RabidFan.objects.current.filter(
+                identity__in=[f.identity for f in rabid_fans], team__isnull=True).count())
+            self.assertEqual(number_of_fans, Fan.objects.as_of(t1).filter(team__identity=team.identity).count())
+
+        # The number of queries does not depend on the number of fans
+        delete_team_with_fans(2)
+        delete_team_with_fans(20)
+
+    def test_set_on_delete_of_non_current_version(self):
+        fan = Fan.objects.create(name='fan', team=self.team)
+        collector = VersionedCollector(using='default')
+        collector.collect([self.team])
+        # The fan is ended after having been collected
+        Fan.objects.filter(pk=fan.pk).update(version_end_date=get_utc_now())
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                collector.delete(get_utc_now())
+
+    def test_custom_versionable_delete(self):
+        deleted = []
+
+        class CustomCollector(VersionedCollector):
+            def versionable_delete(self, instance, timestamp):
+                deleted.append(instance)
+                super(CustomCollector, self).versionable_delete(instance, timestamp)
+
+        collector = CustomCollector(using='default')
+        collector.collect([self.team])
+        collector.delete(get_utc_now())
+        self.assertIn(self.team, deleted)
+        self.assertIn(self.p1, deleted)
+        self.assertIn(self.m1, deleted)
+        self.assertEqual(0, Player.objects.current.filter(pk__in=[self.p1.pk, self.p2.pk]).count())
+
+    def test_deleted_instance_in_memory(self):
+        self.team.delete()
+        self.assertFalse(self.team.is_current)
+        self.assertIsNotNone(self.team.version_end_date)
+        with self.assertRaises(DeletionOfNonCurrentVersionError):
+            self.team.delete()
+        restored = self.team.restore()
+        self.assertTrue(restored.is_current)
+
+
 class CurrentVersionTest(TestCase):
     def setUp(self):
         self.b, self.t1, self.t2, self.t3 = set_up_one_object_with_3_versions()
@@ -385,6 +529,44 @@ class VersionedQuerySetTest(TestCase):
         self.assertEqual(False, b3.is_current)
 
 
+class StreamTest(TestCase):
+    def setUp(self):
+        self.b, self.t1, self.t2, self.t3 = set_up_one_object_with_3_versions()
+        for name in ('c1', 'c2', 'c3', 'c4'):
+            B.objects.create(name=name)
+        self.t4 = get_utc_now()
+        B.objects.create(name='c5')
+
+    def test_iterator_sets_querytime(self):
+        for b in B.objects.as_of(self.t1).iterator():
+            self.assertEqual(self.t1, b.as_of)
+
+    def test_stream(self):
+        streamed = list(B.objects.as_of(self.t4).stream(chunk_size=2))
+        self.assertEqual(['c1', 'c2', 'c3', 'c4', 'v3'], sorted(b.name for b in streamed))
+        for b in streamed:
+            self.assertEqual(self.t4, b.as_of)
+
+        self.assertEqual(['v2'], [b.name for b in B.objects.as_of(self.t2).stream()])
+        self.assertEqual(8, len(list(B.objects.stream(chunk_size=3))))
+
+    @skipUnless(connection.vendor == 'postgresql', 'The ordering is only kept when using a server-side cursor')
+    def test_stream_keeps_ordering(self):
+        self.assertEqual(['c4', 'c3', 'c2', 'c1', 'v3'],
+                         [b.name for b in B.objects.as_of(self.t4).order_by('-version_start_date').stream(2)])
+
+    def test_writes_are_kept_when_stopping_early(self):
+        for b in B.objects.as_of(self.t4).stream(chunk_size=2):
+            B.objects.create(name='written while streaming')
+            break
+        self.assertTrue(B.objects.current.filter(name='written while streaming').exists())
+
+    @skipUnless(connection.vendor == 'sqlite', 'Keyset pagination is only used on SQLite here')
+    def test_stream_by_keyset_uses_one_query_per_chunk(self):
+        with self.assertNumQueries(3):
+            self.assertEqual(5, len(list(B.objects.as_of(self.t4).stream(chunk_size=2))))
+
+
 class VersionNavigationTest(TestCase):
     def setUp(self):
         self.b, self.t1, self.t2, self.t3 = set_up_one_object_with_3_versions()
@@ -438,6 +620,292 @@ class VersionNavigationTest(TestCase):
 
         self.assertRaises(ObjectDoesNotExist, lambda: B.objects.next_version(v3))
 
+    def test_navigating_many_versions_at_once(self):
+        other = B.objects.create(name='w1')
+        versions = list(B.objects.order_by('version_start_date'))
+        self.assertEqual(['v1', 'v2', 'v3', 'w1'], [v.name for v in versions])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(['v2', 'v3', 'v3', 'w1'], [v.name for v in B.objects.next_versions(versions)])
+        with self.assertNumQueries(1):
+            self.assertEqual(['v1', 'v1', 'v2', 'w1'], [v.name for v in B.objects.previous_versions(versions)])
+        with self.assertNumQueries(1):
+            self.assertEqual(['v3', 'v3', 'v3', 'w1'], [v.name for v in B.objects.current_versions(versions)])
+        with self.assertNumQueries(0):
+            self.assertEqual(['v3', 'w1'], [v.name for v in B.objects.next_versions([versions[2], other])])
+
+        # relations_as_of is applied just like for the single-object navigation
+        v2 = B.objects.next_versions(versions[:1], relations_as_of='start')[0]
+        self.assertEqual(v2.version_start_date, v2.as_of)
+
+        # The fallback for databases without window functions gives the same results
+        for direction in ('next', 'previous'):
+            self.assertEqual(B.objects._neighbour_versions_by_identity(versions, direction),
+                             B.objects._neighbour_versions(versions, direction))
+
+        other.delete()
+        self.assertEqual([None], B.objects.current_versions([other]))
+        self.assertRaises(ObjectDoesNotExist, lambda: B.objects.next_versions([versions[0], other]))
+
+
+class HistoryTest(TestCase):
+    def setUp(self):
+        self.b, self.t1, self.t2, self.t3 = set_up_one_object_with_3_versions()
+        self.other = B.objects.create(name='w1')
+
+    def test_history(self):
+        with self.assertNumQueries(1):
+            history = dict(B.objects.history([self.b.identity, self.other.identity, self.b.identity]))
+        self.assertEqual(['v1', 'v2', 'v3'], [v.name for v in history[self.b.identity]])
+        self.assertEqual(['w1'], [v.name for v in history[self.other.identity]])
+
+        # as_of is set like adjust_version_as_of() does
+        v1 = history[self.b.identity][0]
+        self.assertEqual(v1.version_end_date - datetime.timedelta(microseconds=1), v1.as_of)
+
+    def test_history_in_time_window(self):
+        history = list(B.objects.history([self.b.identity, self.other.identity], start=self.t1, end=self.t2))
+        self.assertEqual([(self.b.identity, ['v1', 'v2'])],
+                         [(identity, [v.name for v in versions]) for identity, versions in history])
+
+        self.assertEqual([], list(B.objects.history([])))
+
+
+class FieldChangesTest(TestCase):
+    def setUp(self):
+        self.team1 = Team.objects.create(name='team1')
+        self.team2 = Team.objects.create(name='team2')
+        self.player = Player.objects.create(name='p1', team=self.team1)
+        Player.objects.create(name='p2', team=self.team1).clone()
+
+        self.player = self.player.clone()
+        self.player.name = 'p1.renamed'
+        self.player.save()
+        self.player = self.player.clone()
+        self.player = self.player.clone()
+        self.player.team = self.team2
+        self.player.save()
+        self.versions = list(Player.objects.filter(identity=self.player.identity).order_by('version_start_date'))
+
+    def test_field_changes(self):
+        with self.assertNumQueries(1):
+            changes = list(Player.objects.field_changes('name', 'team'))
+        self.assertEqual([
+            (self.player.identity, 'name', 'p1', 'p1.renamed', self.versions[1].version_start_date),
+            (self.player.identity, 'team', self.team1.id, self.team2.id, self.versions[3].version_start_date),
+        ], changes)
+        self.assertEqual('team', changes[1].field)
+
+        self.assertEqual(changes, list(Player.objects.field_changes()))
+        self.assertEqual(changes[1:], list(Player.objects.field_changes('team')))
+        self.assertEqual([], list(Player.objects.filter(name='p2').field_changes()))
+
+    def test_field_changes_without_window_functions(self):
+        fields = [Player._meta.get_field('name'), Player._meta.get_field('team')]
+        versions = Player.objects.order_by('identity', 'version_start_date')
+        self.assertEqual(list(Player.objects.field_changes('name', 'team')),
+                         list(Player.objects.all()._iter_field_changes(versions, fields)))
+
+
+class SnapshotTest(TestCase):
+    def setUp(self):
+        self.city = City.objects.create(name='city.v1')
+        self.team = Team.objects.create(name='team.v1', city=self.city)
+        self.p1 = Player.objects.create(name='p1.v1', team=self.team)
+        self.p2 = Player.objects.create(name='p2.v1', team=self.team)
+        self.t1 = get_utc_now()
+        sleep(0.1)
+
+        self.team = self.team.clone()
+        self.team.name = 'team.v2'
+        self.team.save()
+        self.city = self.city.clone()
+        self.city.name = 'city.v2'
+        self.city.save()
+        self.p1 = self.p1.clone()
+        self.p1.name = 'p1.v2'
+        self.p1.save()
+        Player.objects.create(name='p3.v1', team=self.team)
+
+    def test_snapshot_as_of(self):
+        snapshot = Snapshot('t1', [Team, Player], timestamp=self.t1)
+        snapshot.create()
+        self.addCleanup(snapshot.drop)
+
+        players = Player.objects.snapshot(snapshot)
+        self.assertEqual(['p1.v1', 'p2.v1'], sorted(players.values_list('name', flat=True)))
+        self.assertEqual(2, players.filter(team__name='team.v1').count())
+        self.assertEqual(2, players.filter(team__city__name='city.v1').count())
+        self.assertEqual(0, players.filter(team__city__name='city.v2').count())
+
+        player = players.get(identity=self.p1.identity)
+        self.assertEqual(self.t1, player.as_of)
+        self.assertEqual('team.v1', player.team.name)
+        self.assertEqual('city.v1', player.team.city.name)
+
+        # Changes made after the snapshot has been created are not visible until it is refreshed
+        Player.objects.create(name='p4.v1')
+        self.assertEqual(2, players.count())
+
+    def test_snapshot_is_read_only(self):
+        snapshot = Snapshot('t1', [Team, Player], timestamp=self.t1)
+        snapshot.create()
+        self.addCleanup(snapshot.drop)
+
+        players = Player.objects.snapshot(snapshot)
+        self.assertRaises(SuspiciousOperation, players.update, name='p')
+        self.assertRaises(SuspiciousOperation, players.delete)
+        self.assertRaises(SuspiciousOperation, players.create, name='p')
+        self.assertRaises(SuspiciousOperation, players.as_of, self.t1)
+        self.assertRaises(ValueError, City.objects.snapshot, snapshot)
+
+    def test_refreshing_current_snapshot(self):
+        snapshot = Snapshot('current', [Team, Player])
+        snapshot.create()
+        self.addCleanup(snapshot.drop)
+
+        players = Player.objects.snapshot(snapshot)
+        self.assertEqual(['p1.v2', 'p2.v1', 'p3.v1'], sorted(players.values_list('name', flat=True)))
+        self.assertEqual(0, snapshot.refresh())
+
+        p2 = self.p2.clone()
+        p2.name = 'p2.v2'
+        p2.save()
+        self.p1.delete()
+        # p2's row is replaced, p1's row is removed
+        self.assertEqual(3, snapshot.refresh())
+        self.assertEqual(['p2.v2', 'p3.v1'], sorted(players.values_list('name', flat=True)))
+        self.assertEqual(2, players.filter(team__name='team.v2').count())
+
+    def test_plain_foreign_key_to_historic_version(self):
+        Transfer.objects.create(name='transfer', player=Player.objects.as_of(self.t1).get(identity=self.p1.identity))
+        snapshot = Snapshot('current', [Transfer, Player])
+        snapshot.create()
+        self.addCleanup(snapshot.drop)
+
+        # The historic version is not part of the snapshot, it is read from the model's table
+        transfers = Transfer.objects.snapshot(snapshot)
+        self.assertEqual(1, transfers.filter(player__name='p1.v1').count())
+        self.assertEqual(0, transfers.filter(player__name='p1.v2').count())
+        self.assertEqual('p1.v1', transfers.get().player.name)
+
+
+@override_settings(VERSIONED_ARCHIVED_MODELS=['versions_tests.Player', 'versions_tests.Award'])
+class ArchiveTest(TestCase):
+    def setUp(self):
+        self.team = Team.objects.create(name='team')
+        self.player = Player.objects.create(name='p.v1', team=self.team)
+        self.award = Award.objects.create(name='award')
+        self.award.players.add(self.player)
+        self.t1 = get_utc_now()
+        sleep(0.1)
+        self.player = self.player.clone()
+        self.player.name = 'p.v2'
+        self.player.save()
+        self.award.players.remove(self.player)
+        self.t2 = get_utc_now()
+        sleep(0.1)
+        self.player = self.player.clone()
+        self.player.name = 'p.v3'
+        self.player.save()
+        self.t3 = get_utc_now()
+        self.removed = Player.objects.create(name='removed')
+        self.removed.delete()
+
+    def test_archive_versions(self):
+        # The player's first two versions, and the relationship rows of the award with both of them
+        self.assertEqual(4, archive_versions(Player, self.t3, chunk_size=1))
+        self.assertEqual(0, archive_versions(Award, self.t3, chunk_size=1))
+        self.assertEqual(0, archive_versions(Player, self.t3))
+        self.assertEqual(['p.v3', 'removed'], sorted(Player.objects.values_list('name', flat=True)))
+        self.assertEqual(0, Award.players.through.objects.count())
+
+    def test_versions_referenced_by_foreign_keys_are_kept(self):
+        Transfer.objects.create(name='transfer', player=Player.objects.get(name='p.v1'))
+
+        # The player's second version, and the relationship rows of the award with both versions
+        self.assertEqual(3, archive_versions(Player, self.t3))
+        self.assertEqual(['p.v1', 'p.v3', 'removed'], sorted(Player.objects.values_list('name', flat=True)))
+        self.assertEqual('p.v1', Transfer.objects.current.get().player.name)
+
+    def test_as_of_reads_archive(self):
+        archive_versions(Player, get_utc_now())
+        archive_versions(Award, get_utc_now())
+
+        self.assertEqual('p.v1', Player.objects.as_of(self.t1).get(identity=self.player.identity).name)
+        self.assertEqual('p.v2', Player.objects.as_of(self.t2).get(identity=self.player.identity).name)
+        self.assertEqual('p.v3', Player.objects.current.get(identity=self.player.identity).name)
+        self.assertEqual(1, Team.objects.as_of(self.t1).filter(player__name='p.v1').count())
+
+        award = Award.objects.as_of(self.t1).get()
+        self.assertEqual(['p.v1'], [p.name for p in award.players.all()])
+        self.assertEqual([], list(Award.objects.as_of(self.t2).get().players.all()))
+
+        self.assertIn('_archive', str(Player.objects.as_of(self.t1).query))
+        self.assertNotIn('_archive', str(Player.objects.current.query))
+
+    def test_version_navigation_reads_archive(self):
+        archive_versions(Player, get_utc_now())
+        identity = self.player.identity
+
+        self.assertEqual([(identity, ['p.v1', 'p.v2', 'p.v3'])],
+                         [(i, [v.name for v in versions]) for i, versions in Player.objects.history([identity])])
+        first = Player.objects.as_of(self.t1).get(identity=identity)
+        self.assertEqual('p.v2', Player.objects.next_version(first).name)
+        self.assertEqual(['p.v2'], [v.name for v in Player.objects.next_versions([first])])
+        second = Player.objects.previous_version(self.player)
+        self.assertEqual('p.v2', second.name)
+        self.assertEqual(['p.v1'], [v.name for v in Player.objects.previous_versions([second])])
+
+    @skipUnless(connection.vendor == 'postgresql' and VERSION[:2] >= (1, 7) and connection.pg_version >= 120000,
+                'Validity ranges need PostgreSQL 12 or later')
+    def test_as_of_with_validity_ranges(self):
+        with connection.cursor() as cursor:
+            # Fire the deferred foreign key checks, tables with pending trigger events can not be altered
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        archive_versions(Player, get_utc_now())
+        archive_versions(Award, get_utc_now())
+
+        with override_settings(VERSIONED_VALIDITY_RANGE_MODELS=['versions_tests.Player', 'versions_tests.Award']):
+            add_validity_ranges('versions_tests', exclusion_constraints=False)
+            self.assertEqual('p.v1', Player.objects.as_of(self.t1).get(identity=self.player.identity).name)
+            self.assertEqual(['p.v1'], [p.name for p in Award.objects.as_of(self.t1).get().players.all()])
+            self.assertIn('version_validity @>', str(Player.objects.as_of(self.t1).query))
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Foreign keys are only checked by PostgreSQL here')
+class ArchiveCommitTest(TransactionTestCase):
+    def test_foreign_keys_hold(self):
+        player = Player.objects.create(name='p.v1')
+        award = Award.objects.create(name='award')
+        award.players.add(player)
+        player = player.clone()
+        player.name = 'p.v2'
+        player.save()
+        award.players.remove(player)
+        cutoff = get_utc_now()
+
+        # The deferred foreign key checks of the relationship rows referencing the archived versions are run
+        # when the transaction of each chunk is committed
+        # The player's first version, and the relationship rows of the award with both of its versions
+        self.assertEqual(3, archive_versions(Player, cutoff, chunk_size=1))
+        self.assertEqual(0, Award.players.through.objects.count())
+
+    def test_plain_foreign_keys_hold(self):
+        player = Player.objects.create(name='p.v1')
+        player = player.clone()
+        player.name = 'p.v2'
+        player.save()
+        player = player.clone()
+        player.name = 'p.v3'
+        player.save()
+        Transfer.objects.create(name='transfer', player=Player.objects.get(name='p.v1'))
+        cutoff = get_utc_now()
+
+        # The first version is kept, since the transfer's foreign key points to it
+        self.assertEqual(1, archive_versions(Player, cutoff, chunk_size=1))
+        self.assertEqual(['p.v1', 'p.v3'], sorted(Player.objects.values_list('name', flat=True)))
+
 
 class VersionNavigationAsOfTest(TestCase):
     def setUp(self):
@@ -641,6 +1109,25 @@ class OneToManyTest(TestCase):
         team_at_t2 = Team.objects.as_of(t2).first()
         self.assertEqual(2, team_at_t2.player_set.count())
 
+    def test_accessing_the_team_takes_a_single_query(self):
+        t1 = get_utc_now()
+        sleep(0.1)
+
+        team = self.team.clone()
+        team.name = 't.v2'
+        team.save()
+
+        # The foreign key points to the current version of the team, but the player's query time is t1
+        p1_at_t1 = Player.objects.as_of(t1).get(name='p1.v1')
+        with self.assertNumQueries(1):
+            self.assertEqual('t.v1', p1_at_t1.team.name)
+        with self.assertNumQueries(0):
+            self.assertEqual('t.v1', p1_at_t1.team.name)
+
+        p1 = Player.objects.current.get(name='p1.v1')
+        with self.assertNumQueries(1):
+            self.assertEqual('t.v2', p1.team.name)
+
     def test_creating_new_version_of_the_player(self):
         t1 = get_utc_now()
         sleep(0.1)
@@ -1340,27 +1827,45 @@ class MultiM2MTest(TestCase):
         # - 3 professors
         # - 3 classrooms
 
-        # There are 12 queries against the DB:
+        # There are 11 queries against the DB:
         # - 3 for writing the new version of the object itself
         #   o 1 attempt to update the earlier version
         #   o 1 insert of the earlier version
         #   o 1 update of the later version
-        # - 5 for the professors relationship
-        #   o 1 for selecting all concerned professor objects
-        #   o 1 for selecting all concerned intermediate table entries (student_professor)
-        #   o 1 for updating current intermediate entry versions
-        #   o 1 for non-current rel-entries pointing the annika-object
+        # - 4 for the professors relationship
+        #   o 1 for selecting the current intermediate table entries (student_professor)
+        #   o 1 for moving non-current rel-entries to the earlier annika-object
         #     (there's 1 originating from the clone-operation on mr_biggs)
-        #   o 1 for inserting new versions
+        #   o 1 for updating current intermediate entry versions
+        #   o 1 for inserting the earlier versions of the current entries
         # - 4 for the classrooms M2M relationship
-        #   o 1 for selecting all concerned classroom objects
-        #   o 1 for selecting all concerned intermediate table entries (student_classroom)
+        #   o 1 for selecting the current intermediate table entries (student_classroom)
+        #   o 1 for moving non-current rel-entries to the earlier annika-object
         #   o 1 for updating current intermediate entry versions
-        #   o 0 for non-current rel-entries pointing the annika-object
-        #   o 1 for inserting new versions
-        with self.assertNumQueries(12):
+        #   o 1 for inserting the earlier versions of the current entries
+        with self.assertNumQueries(11):
             annika.clone()
 
+    def test_constant_number_of_queries_when_cloning_many_relations(self):
+        """
+        The number of queries does not depend on the number of relations, neither for forward
+        fields nor for related descriptors.
+        """
+        award = Award.objects.create(name='award')
+        players = [Player.objects.create(name='player-{}'.format(i)) for i in range(30)]
+        award.players.add(*players[:3])
+        with self.assertNumQueries(7):
+            award = award.clone()
+        award.players.add(*players[3:])
+        with self.assertNumQueries(7):
+            award = award.clone()
+        self.assertEqual(30, award.players.count())
+
+        player = players[0]
+        with self.assertNumQueries(7):
+            player = player.clone()
+        self.assertEqual([award], list(player.awards.all()))
+
     def test_no_duplicate_m2m_entries_after_cloning_related_object(self):
         """
         This test ensures there are no duplicate entries added when cloning an object participating
@@ -1853,6 +2358,21 @@ class HistoricM2MOperationsTests(TestCase):
     def test_simple(self):
         self.big_brother.subjects.all().first()
 
+    def test_remove_at_uses_a_single_query(self):
+        ts = datetime.datetime(1984, 6, 1, tzinfo=utc)
+        subjects = [Subject.objects._create_at(ts, name='Subject {}'.format(i)) for i in range(20)]
+        self.big_brother.subjects.add_at(ts, *subjects)
+
+        ts_later = ts + datetime.timedelta(days=1)
+        with self.assertNumQueries(1):
+            removed = self.big_brother.subjects.remove_at(ts_later, *subjects[:15])
+        self.assertEqual(15, removed)
+        self.assertEqual(5, Observer.objects.current.get().subjects.count())
+        self.assertEqual(20, Observer.objects.as_of(ts).get().subjects.count())
+
+        # Terminated relations are not terminated a second time
+        self.assertEqual(0, self.big_brother.subjects.remove_at(ts_later, *subjects[:15]))
+
 
 class M2MDirectAssignmentTests(TestCase):
     def setUp(self):
@@ -1967,6 +2487,38 @@ class PrefetchingTests(TestCase):
             self.assertIsNotNone(player)
             self.assertEqual(self.city1, player.team.city)
 
+    def test_prefetch_versioned(self):
+        team2 = Team.objects.create(name='te2.v1', city=self.city1)
+        Player.objects.create(name='pl3.v1', team=team2)
+        Player.objects.create(name='pl4.v1')
+        sleep(0.1)
+        t2 = get_utc_now()
+
+        city1 = self.city1.clone()
+        city1.name = 'Chicago.v2'
+        city1.save()
+        team1 = self.team1.clone()
+        team1.name = 'te1.v2'
+        team1.save()
+
+        # One query for the players, one per relation
+        with self.assertNumQueries(3):
+            players = list(Player.objects.as_of(t2).prefetch_versioned('team', 'team__city').order_by('name'))
+            self.assertEqual(['te1.v1', 'te1.v1', 'te2.v1'], [p.team.name for p in players[:3]])
+            self.assertEqual(['Chicago'] * 3, [p.team.city.name for p in players[:3]])
+            self.assertIsNone(players[3].team)
+
+        with self.assertNumQueries(3):
+            players = list(Player.objects.current.prefetch_versioned('team__city').order_by('name'))
+            self.assertEqual(['te1.v2', 'te1.v2', 'te2.v1'], [p.team.name for p in players[:3]])
+            self.assertEqual(['Chicago.v2'] * 3, [p.team.city.name for p in players[:3]])
+
+        with self.assertNumQueries(1):
+            players = list(Player.objects.current.prefetch_versioned('team').prefetch_versioned(None))
+
+        with self.assertRaises(ValueError):
+            list(Player.objects.current.prefetch_versioned('name'))
+
     @skipUnless(connection.vendor == 'sqlite', 'SQL is database specific, only sqlite is tested here.')
     def test_select_related_query_sqlite(self):
         select_related_queryset = Player.objects.as_of(self.t1).select_related('team').all()
@@ -2139,6 +2691,35 @@ class PrefetchingTests(TestCase):
                 self.assertTrue(new == old - 1)
 
 
+    def test_prefetch_related_for_instances_with_different_query_times(self):
+        award = Award.objects.create(name='award')
+        self.p1.awards.add(award)
+        sleep(0.1)
+        t2 = get_utc_now()
+
+        team1 = self.team1.clone()
+        team1.name = 'te1.v2'
+        team1.save()
+        Player.objects.create(name='pl3.v1', team=team1)
+        p1 = Player.objects.current.get(name='pl1.v1')
+        p1.awards.remove(award)
+
+        teams = [Team.objects.as_of(self.t1).get(), Team.objects.as_of(t2).get(), Team.objects.current.get()]
+        # One query per relation and query time
+        with self.assertNumQueries(3):
+            prefetch_related_objects(teams, ['player_set'])
+        with self.assertNumQueries(0):
+            self.assertEqual([['pl1.v1', 'pl2.v1']] * 2 + [['pl1.v1', 'pl2.v1', 'pl3.v1']],
+                             [sorted(p.name for p in team.player_set.all()) for team in teams])
+            self.assertEqual(teams[2], teams[2].player_set.all()[0].team)
+
+        players = [Player.objects.as_of(self.t1).get(name='pl1.v1'), Player.objects.as_of(t2).get(name='pl1.v1'), p1]
+        with self.assertNumQueries(3):
+            prefetch_related_objects(players, ['awards'])
+        with self.assertNumQueries(0):
+            self.assertEqual([0, 1, 0], [len(player.awards.all()) for player in players])
+
+
 class IntegrationNonVersionableModelsTests(TestCase):
     def setUp(self):
         self.bordeaux = Wine.objects.create(name="Bordeaux", vintage=2004)
@@ -2262,8 +2843,8 @@ class SpecifiedUUIDTest(TestCase):
     def test_create_with_uuid(self):
         p_id = self.uuid4()
         p = Person.objects.create(id=p_id, name="Alice")
-        self.assertEqual(p_id, p.id)
-        self.assertEqual(p_id, p.identity)
+        self.assertEqual(p_id, six.text_type(p.id))
+        self.assertEqual(p_id, six.text_type(p.identity))
 
         p_id = six.text_type(str(uuid.uuid5(uuid.NAMESPACE_OID, 'bar')))
         with self.assertRaises(ValueError):
@@ -2296,6 +2877,45 @@ class SpecifiedUUIDTest(TestCase):
         self.assertEqual(p.name, Person.objects.previous_version(p2).name)
 
 
+@skipUnless(versions_settings.get_setting('VERSIONED_NATIVE_UUID'),
+            'Run with the native UUID settings, e.g. cleanerversion.settings.sqlite_native_uuid')
+class NativeUuidTest(TestCase):
+    def test_ids_are_uuids(self):
+        self.assertIsInstance(Versionable.uuid(), uuid.UUID)
+        team = Team.objects.create(name='team')
+        self.assertIsInstance(team.id, uuid.UUID)
+        self.assertIsInstance(Team.objects.get(pk=team.pk).identity, uuid.UUID)
+        # Strings are accepted for filtering
+        self.assertEqual(team, Team.objects.current.get(identity=str(team.identity)))
+
+    def test_create_with_uuid(self):
+        p_id = uuid.uuid4()
+        self.assertTrue(Person.objects.validate_uuid(p_id))
+        p = Person.objects.create(id=str(p_id), name="Alice")
+        self.assertEqual(p_id, p.id)
+        self.assertEqual(p_id, Person.objects.get(pk=p_id).identity)
+
+        p.delete()
+        p2 = Person.objects.create(id=uuid.uuid4(), forced_identity=p_id, name="Alice")
+        self.assertEqual(p_id, p2.identity)
+
+    def test_clone_relations(self):
+        award = Award.objects.create(name='award')
+        players = [Player.objects.create(name='p{}'.format(i)) for i in range(3)]
+        award.players.add(*players)
+        t1 = get_utc_now()
+        sleep(0.1)
+        award = award.clone()
+        self.assertEqual(3, award.players.count())
+        self.assertEqual(3, Award.objects.as_of(t1).get().players.count())
+
+    def test_admin(self):
+        from django.contrib.admin.sites import site
+        from versions.admin import VersionedAdmin
+        team = Team.objects.create(name='team')
+        self.assertEqual('...' + str(team.identity)[-12:], VersionedAdmin(Team, site).identity_shortener(team))
+
+
 class VersionRestoreTest(TestCase):
 
     def setup_common(self):
@@ -2496,3 +3116,212 @@ class DetachTest(TestCase):
         t = Team.objects.current.get(pk=t_pk)
         self.assertEqual({p, p2}, set(t.player_set.all()))
         self.assertEqual([], list(t2.player_set.all()))
+
+
+class CloneAllTest(TestCase):
+    def setUp(self):
+        self.team = Team.objects.create(name='t.v1')
+        self.players = [Player.objects.create(name='p{}.v1'.format(i), team=self.team) for i in range(4)]
+        self.awards = [Award.objects.create(name='a{}.v1'.format(i)) for i in range(2)]
+        for player in self.players:
+            player.awards.add(*self.awards)
+        sleep(0.1)
+        self.t1 = get_utc_now()
+
+    def test_clone_all(self):
+        clones = Player.objects.current.filter(name__startswith='p').clone_all(team=None)
+        self.assertEqual(4, len(clones))
+
+        for player in self.players:
+            versions = Player.objects.filter(identity=player.identity).order_by('version_start_date')
+            self.assertEqual(2, len(versions))
+            earlier, later = versions
+            self.assertEqual(player.id, later.id)
+            self.assertIsNone(later.version_end_date)
+            self.assertEqual(earlier.version_end_date, later.version_start_date)
+            self.assertEqual(player.version_birth_date, later.version_birth_date)
+            self.assertEqual(self.team, earlier.team)
+            self.assertIsNone(later.team)
+
+        # All the clones share the same timestamp
+        self.assertEqual(1, len({c.version_start_date for c in clones}))
+        self.assertEqual(4, Player.objects.as_of(self.t1).filter(team__name='t.v1').count())
+        self.assertEqual(0, Player.objects.current.filter(team__name='t.v1').count())
+
+    def test_clone_all_ignores_non_current_versions(self):
+        self.players[0].delete()
+        clones = Player.objects.filter(name__startswith='p').clone_all()
+        self.assertEqual(3, len(clones))
+        self.assertEqual(1, Player.objects.filter(identity=self.players[0].identity).count())
+
+    def test_clone_all_keeps_m2m_relations(self):
+        self.players[0].awards.remove(self.awards[1])
+        sleep(0.1)
+        t2 = get_utc_now()
+
+        Player.objects.current.clone_all()
+
+        for player in Player.objects.current.all():
+            expected = self.awards[:1] if player.identity == self.players[0].identity else self.awards
+            self.assertSetEqual(set(expected), set(player.awards.all()))
+            self.assertSetEqual(set(self.awards), set(Player.objects.as_of(self.t1).get(
+                identity=player.identity).awards.all()))
+            self.assertSetEqual(set(expected), set(Player.objects.as_of(t2).get(
+                identity=player.identity).awards.all()))
+
+        # Reverse relations are cloned as well
+        Award.objects.current.clone_all(name='award')
+        for award in Award.objects.current.all():
+            self.assertEqual(4 if award.identity == self.awards[0].identity else 3, award.players.count())
+            self.assertEqual(4, Award.objects.as_of(self.t1).get(identity=award.identity).players.count())
+
+    def test_constant_number_of_queries(self):
+        # There are 7 queries against the DB, independently of the number of objects and relations:
+        # - 3 for the players
+        #   o 1 for selecting the current players
+        #   o 1 for inserting the earlier versions
+        #   o 1 for updating the later versions
+        # - 4 for the awards relationship
+        #   o 1 for selecting the current intermediate table entries
+        #   o 1 for moving non-current entries to the earlier versions
+        #   o 1 for updating the current entries
+        #   o 1 for inserting the earlier versions of the current entries
+        with self.assertNumQueries(7):
+            Player.objects.current.filter(name__in=['p0.v1', 'p1.v1']).clone_all()
+        with self.assertNumQueries(7):
+            Player.objects.current.clone_all()
+
+    def test_multi_table_inheritance_is_refused(self):
+        self.assertRaises(TypeError, Car.objects.current.clone_all)
+
+
+class UpdateVersionedTest(TestCase):
+    def setUp(self):
+        self.team = Team.objects.create(name='t.v1')
+        self.players = [Player.objects.create(name='p{}.v1'.format(i), team=self.team) for i in range(4)]
+        self.award = Award.objects.create(name='a.v1')
+        self.award.players.add(*self.players)
+        sleep(0.1)
+        self.t1 = get_utc_now()
+
+    def test_update_versioned(self):
+        updated = Player.objects.current.filter(name__in=['p0.v1', 'p1.v1']).update_versioned(name='renamed')
+        self.assertEqual(2, updated)
+
+        for player in self.players[:2]:
+            current = Player.objects.current.get(identity=player.identity)
+            self.assertEqual(player.id, current.id)
+            self.assertEqual('renamed', current.name)
+            self.assertEqual(self.team, current.team)
+            self.assertEqual(player.version_birth_date, current.version_birth_date)
+            previous = Player.objects.previous_version(current)
+            self.assertEqual(player.name, previous.name)
+            self.assertEqual(current.version_start_date, previous.version_end_date)
+            self.assertEqual(player.version_start_date, previous.version_start_date)
+            self.assertEqual(self.team.pk, previous.team_id)
+        for player in self.players[2:]:
+            self.assertEqual(1, Player.objects.filter(identity=player.identity).count())
+
+        self.assertEqual(4, Player.objects.as_of(self.t1).filter(name__startswith='p').count())
+        self.assertEqual(2, Player.objects.current.filter(name='renamed').count())
+
+    def test_multi_table_inheritance_is_refused(self):
+        self.assertRaises(TypeError, Car.objects.current.update_versioned, seats=2)
+
+    def test_update_filtered_through_join(self):
+        team = self.team.clone()
+        team.name = 't.v2'
+        team.save()
+        # The joined teams are restricted to the current ones
+        self.assertEqual(0, Player.objects.current.filter(team__name='t.v1').update(name='renamed'))
+        self.assertEqual(4, Player.objects.current.filter(team__name='t.v2').update(name='renamed'))
+
+    def test_update_versioned_with_expressions(self):
+        red = Color.objects.create(name='red')
+        green = Color.objects.create(name='green')
+        store = ChainStore.objects.create(subchain_id=1, city='Bern', name='Bern', opening_hours='9-5',
+                                          door_frame_color=red, door_color=green)
+        ChainStore.objects.current.update_versioned(subchain_id=F('subchain_id') + 1)
+        current = ChainStore.objects.current.get(identity=store.identity)
+        self.assertEqual(2, current.subchain_id)
+        self.assertEqual(1, ChainStore.objects.previous_version(current).subchain_id)
+
+    def test_update_versioned_keeps_m2m_relations(self):
+        Award.objects.current.update_versioned(name='a.v2')
+        award = Award.objects.current.get()
+        self.assertEqual(4, award.players.count())
+        self.assertEqual(4, Award.objects.as_of(self.t1).get().players.count())
+
+        Player.objects.current.update_versioned(team=None)
+        for player in Player.objects.current.all():
+            self.assertEqual([award], list(player.awards.all()))
+            self.assertEqual('a.v1', Player.objects.as_of(self.t1).get(
+                identity=player.identity).awards.get().name)
+
+    def test_constant_number_of_queries(self):
+        # There are 7 queries against the DB, independently of the number of objects and relations:
+        # - 1 for selecting the primary keys of the current players
+        # - 1 for inserting the earlier versions
+        # - 1 for updating the later versions
+        # - 4 for the awards relationship (see CloneAllTest.test_constant_number_of_queries)
+        with self.assertNumQueries(7):
+            Player.objects.current.filter(name='p0.v1').update_versioned(name='p0.v2')
+        with self.assertNumQueries(7):
+            Player.objects.current.update_versioned(name='renamed')
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Server-side cloning is only supported by PostgreSQL')
+class ServerSideCloneTest(TestCase):
+    def test_single_query(self):
+        b = B.objects.create(name='v1')
+        birth_date = b.version_birth_date
+        with self.assertNumQueries(1):
+            b_new = b.clone(server_side=True)
+
+        self.assertEqual(b.identity, b_new.id)
+        self.assertNotEqual(b.id, b_new.id)
+        self.assertEqual(b.version_end_date, b_new.version_start_date)
+        self.assertEqual(birth_date, b.version_start_date)
+        self.assertEqual(birth_date, b_new.version_birth_date)
+        self.assertIsNone(b_new.version_end_date)
+
+        self.assertEqual(2, B.objects.filter(identity=b.identity).count())
+        earlier = B.objects.get(pk=b.pk)
+        self.assertEqual(b.version_end_date, earlier.version_end_date)
+        self.assertEqual('v1', earlier.name)
+        self.assertEqual(b_new, B.objects.current.get(identity=b.identity))
+
+    def test_historic_version_copied_from_database(self):
+        b = B.objects.create(name='v1')
+        b.name = 'not saved'
+        b_new = b.clone(server_side=True)
+        self.assertEqual('v1', b.name)
+        self.assertEqual('v1', b_new.name)
+        self.assertEqual('v1', B.objects.get(pk=b.pk).name)
+
+    def test_not_used_by_default(self):
+        b = B.objects.create(name='v1')
+        b.name = 'not saved'
+        b_new = b.clone()
+        self.assertEqual('not saved', b_new.name)
+        self.assertEqual('not saved', B.objects.get(pk=b.pk).name)
+
+    def test_cloning_terminated_row(self):
+        b = B.objects.create(name='v1')
+        # Terminate the version behind the object's back
+        B.objects.filter(pk=b.pk).update(version_end_date=get_utc_now())
+        with self.assertRaises(ValueError):
+            b.clone(server_side=True)
+        self.assertEqual(1, B.objects.filter(identity=b.identity).count())
+
+    def test_m2m_relations(self):
+        player = Player.objects.create(name='p1')
+        award = Award.objects.create(name='a1')
+        player.awards.add(award)
+        sleep(0.1)
+        t1 = get_utc_now()
+
+        player_new = player.clone(server_side=True)
+        self.assertEqual([award], list(player_new.awards.all()))
+        self.assertEqual([award], list(Player.objects.as_of(t1).get(identity=player.identity).awards.all()))
+        self.assertEqual([award], list(player.awards.all()))
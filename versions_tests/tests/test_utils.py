@@ -2,9 +2,14 @@ from unittest import skipUnless
 from django import VERSION
 from django.db import connection
 from django.test import TestCase, TransactionTestCase
-from django.db import IntegrityError
-from versions_tests.models import ChainStore, Color
-from versions.util.postgresql import get_uuid_like_indexes_on_table
+from django.test.utils import override_settings
+from django.db import IntegrityError, transaction
+from versions_tests.models import Award, ChainStore, Color, Player, Team, Transfer
+from versions.models import get_utc_now
+from versions.util import sqlite
+from versions.util.explain import IndexUsageTestMixin, full_scans
+from versions.util.postgresql import (add_validity_ranges, convert_uuid_columns_to_native, create_temporal_indexes,
+                                      get_uuid_like_indexes_on_table, index_exists, partition_versions)
 
 
 AT_LEAST_17 = VERSION[:2] >= (1, 7)
@@ -101,3 +106,256 @@ class PostgresqlUuidLikeIndexesTest(TestCase):
         # updates and inserts.  So, they should have been removed by the post_migrate handler in
         # versions_tests.apps.VersionsTestsConfig.ready.
         self.assertEqual(0, len(get_uuid_like_indexes_on_table(ChainStore)))
+
+
+@skipUnless(AT_LEAST_17 and connection.vendor == 'postgresql', "Postgresql-specific test")
+class PostgresqlTemporalIndexesTest(TestCase):
+    def test_temporal_indexes(self):
+        # The indexes have been created by the post_migrate handler in versions_tests.apps.VersionsTestsConfig.ready
+        with connection.cursor() as cursor:
+            self.assertTrue(index_exists(cursor, 'versions_tests_versions_tests_player_identity_v_temporal'))
+            self.assertTrue(index_exists(cursor, 'versions_tests_versions_tests_player_team_id_v_current'))
+            # Auto-created many-to-many tables get them, too
+            self.assertTrue(index_exists(cursor, 'versions_tests_versions_tests_award_players_player_id_v_current'))
+        self.assertEqual(0, create_temporal_indexes('versions_tests'))
+
+        with connection.cursor() as cursor:
+            cursor.execute("DROP INDEX versions_tests_versions_tests_player_team_id_v_current")
+        self.assertEqual(1, create_temporal_indexes('versions_tests'))
+
+
+@skipUnless(AT_LEAST_17 and connection.vendor == 'sqlite', "Sqlite-specific test")
+class SqliteIndexesTest(TestCase):
+    def test_indexes(self):
+        # The indexes have been created by the post_migrate handler in versions_tests.apps.VersionsTestsConfig.ready
+        with connection.cursor() as cursor:
+            for index_name in ('versions_tests_versions_tests_player_identity_v_uniq',
+                               'versions_tests_versions_tests_chainstore_sub_cit_nam_v_uniq',
+                               'versions_tests_versions_tests_player_identity_v_temporal',
+                               'versions_tests_versions_tests_player_team_id_v_current',
+                               'versions_tests_versions_tests_award_players_player_id_v_current'):
+                self.assertTrue(sqlite.index_exists(cursor, index_name), index_name)
+        self.assertEqual(0, sqlite.create_current_version_unique_indexes('versions_tests'))
+        self.assertEqual(0, sqlite.create_current_version_unique_identity_indexes('versions_tests'))
+        self.assertEqual(0, sqlite.create_temporal_indexes('versions_tests'))
+
+    def test_only_one_current_version(self):
+        red = Color.objects.create(name='red')
+        red.clone()
+        green = Color.objects.create(name='green')
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Color.objects.filter(pk=green.pk).update(identity=red.identity)
+
+
+@skipUnless(AT_LEAST_17 and connection.vendor == 'postgresql', "Postgresql-specific test")
+class PostgresqlNativeUuidConversionTest(TestCase):
+    def setUp(self):
+        self.team = Team.objects.create(name='team')
+        self.player = Player.objects.create(name='player', team=self.team)
+        self.team = self.team.clone()
+        with connection.cursor() as cursor:
+            # Fire the deferred foreign key checks, tables with pending trigger events can not be altered
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+    def column_type(self, model, column):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT data_type FROM information_schema.columns WHERE table_name = %s AND column_name = %s",
+                           [model._meta.db_table, column])
+            return cursor.fetchone()[0]
+
+    def test_convert_uuid_columns_to_native(self):
+        convert_uuid_columns_to_native('versions_tests', chunk_size=1)
+        for column in ('id', 'identity', 'team_id'):
+            self.assertEqual('uuid', self.column_type(Player, column))
+        self.assertEqual('uuid', self.column_type(Team, 'id'))
+        self.assertEqual('character varying', self.column_type(Player, 'name'))
+
+        # Running it again does not find anything to convert
+        self.assertEqual(0, convert_uuid_columns_to_native('versions_tests'))
+
+        # Data, constraints and indexes survived the conversion
+        self.assertEqual(str(self.team.identity), str(Player.objects.current.get(name='player').team.identity))
+        with connection.cursor() as cursor:
+            self.assertTrue(index_exists(cursor, 'versions_tests_versions_tests_team_identity_v_uniq'))
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Player.objects.filter(pk=self.player.pk).update(team=Team.uuid())
+
+
+@skipUnless(AT_LEAST_17 and connection.vendor == 'postgresql' and connection.pg_version >= 110000,
+            "Postgresql-specific test requiring declarative partitioning")
+@override_settings(VERSIONED_PARTITIONED_MODELS=['versions_tests.Player'])
+class PostgresqlPartitionedVersionsTest(TestCase):
+    def setUp(self):
+        self.team = Team.objects.create(name='team')
+        self.p1 = Player.objects.create(name='p1', team=self.team)
+        self.p2 = Player.objects.create(name='p2', team=self.team)
+        self.t1 = get_utc_now()
+        self.p1 = self.p1.clone()
+        self.p1.name = 'p1.v2'
+        self.p1.save()
+        with connection.cursor() as cursor:
+            # Fire the deferred foreign key checks, tables with pending trigger events can not be altered
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+    def count_rows(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM %s' % table)
+            return cursor.fetchone()[0]
+
+    def test_partition_versions(self):
+        self.assertEqual(1, partition_versions('versions_tests', drop_referencing_fks=True))
+        # Running it again does not find anything to partition
+        self.assertEqual(0, partition_versions('versions_tests'))
+
+        self.assertEqual(2, self.count_rows('versions_tests_player_current'))
+        self.assertEqual(1, self.count_rows('versions_tests_player_historic'))
+        with connection.cursor() as cursor:
+            self.assertTrue(index_exists(cursor, 'versions_tests_versions_tests_player_identity_v_uniq'))
+
+        # Ending a version moves it to the historic partition
+        self.p2.delete()
+        self.assertEqual(1, self.count_rows('versions_tests_player_current'))
+        self.assertEqual(2, self.count_rows('versions_tests_player_historic'))
+
+        # The foreign keys of the table are kept, those referencing it are gone
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Player.objects.filter(pk=self.p1.pk).update(team=Team.uuid())
+                connection.cursor().execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+    def test_referencing_foreign_keys_are_not_dropped_by_default(self):
+        with self.assertRaises(ValueError) as cm:
+            partition_versions('versions_tests')
+        self.assertIn('versions_tests_transfer', str(cm.exception))
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT relkind FROM pg_class WHERE oid = 'versions_tests_player'::regclass")
+            self.assertEqual('r', cursor.fetchone()[0])
+
+    def test_current_queries_read_the_current_partition(self):
+        partition_versions('versions_tests', drop_referencing_fks=True)
+
+        current = Player.objects.current.filter(team__name='team')
+        self.assertIn('versions_tests_player_current', str(current.query))
+        self.assertEqual(['p1.v2', 'p2'], sorted(p.name for p in current))
+        self.assertIn('versions_tests_player_current', str(Team.objects.current.filter(player__name='p1.v2').query))
+        self.assertEqual(1, Team.objects.current.filter(player__name='p1.v2').count())
+
+        # Clones with a query time in the past read the whole table again
+        self.assertNotIn('versions_tests_player_current', str(current.as_of(self.t1).query))
+        historic = Player.objects.as_of(self.t1).filter(team__name='team')
+        self.assertEqual(['p1', 'p2'], sorted(p.name for p in historic))
+        self.assertNotIn('versions_tests_player_current', str(Player.objects.all().query))
+
+    def test_plain_foreign_keys_read_the_whole_table(self):
+        partition_versions('versions_tests', drop_referencing_fks=True)
+        Transfer.objects.create(name='transfer', player=Player.objects.as_of(self.t1).get(identity=self.p1.identity))
+
+        # The plain ForeignKey points a historic version, which is not in the current partition
+        transfers = Transfer.objects.current.filter(player__name='p1')
+        self.assertNotIn('versions_tests_player_current', str(transfers.query))
+        self.assertEqual(1, transfers.count())
+        self.assertEqual('p1', Transfer.objects.current.get().player.name)
+
+
+@skipUnless(AT_LEAST_17 and connection.vendor == 'postgresql' and connection.pg_version >= 120000,
+            "Postgresql-specific test requiring generated columns")
+@override_settings(VERSIONED_VALIDITY_RANGE_MODELS=['versions_tests.Player', 'versions_tests.Team'])
+class PostgresqlValidityRangeTest(TestCase):
+    def setUp(self):
+        self.team = Team.objects.create(name='team.v1')
+        self.p1 = Player.objects.create(name='p1.v1', team=self.team)
+        self.t1 = get_utc_now()
+        self.p1 = self.p1.clone()
+        self.p1.name = 'p1.v2'
+        self.p1.save()
+        self.team = self.team.clone()
+        self.team.name = 'team.v2'
+        self.team.save()
+        self.t2 = get_utc_now()
+        with connection.cursor() as cursor:
+            # Fire the deferred foreign key checks, tables with pending trigger events can not be altered
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+            cursor.execute("SELECT COUNT(1) FROM pg_available_extensions WHERE name = 'btree_gist'")
+            self.btree_gist_available = cursor.fetchone()[0] > 0
+        add_validity_ranges('versions_tests', exclusion_constraints=self.btree_gist_available)
+
+    def test_as_of_queries_use_validity_range(self):
+        self.assertEqual(0, add_validity_ranges('versions_tests', exclusion_constraints=self.btree_gist_available))
+        with connection.cursor() as cursor:
+            self.assertTrue(index_exists(cursor, 'versions_tests_versions_tests_player_validity_v_gist'))
+
+        players = Player.objects.as_of(self.t1).filter(team__name='team.v1')
+        # Both the players and the joined teams are restricted using the range
+        self.assertEqual(2, str(players.query).count('version_validity @>'))
+        self.assertEqual(['p1.v1'], [p.name for p in players])
+        self.assertEqual('team.v1', players[0].team.name)
+        self.assertEqual(1, Team.objects.as_of(self.t2).filter(player__name='p1.v2', name='team.v2').count())
+        self.assertNotIn('version_validity', str(Player.objects.current.query))
+
+    def test_only_listed_models_use_validity_range(self):
+        with override_settings(VERSIONED_VALIDITY_RANGE_MODELS=['versions_tests.Player']):
+            players = Player.objects.as_of(self.t1).filter(team__name='team.v1')
+            # The joined teams are restricted using their version dates
+            self.assertEqual(1, str(players.query).count('version_validity @>'))
+            self.assertEqual(['p1.v1'], [p.name for p in players])
+            self.assertNotIn('version_validity', str(Team.objects.as_of(self.t1).query))
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(1) FROM information_schema.columns "
+                           "WHERE table_name = 'versions_tests_award' AND column_name = 'version_validity'")
+            self.assertEqual(0, cursor.fetchone()[0])
+
+    def test_exclusion_constraint(self):
+        if not self.btree_gist_available:
+            self.skipTest("The btree_gist extension is not available")
+        # Cloning does not violate the deferred constraint
+        with transaction.atomic():
+            self.p1.clone()
+            connection.cursor().execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Player.objects.filter(identity=self.p1.identity, name='p1.v1').update(version_end_date=None)
+                connection.cursor().execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+
+@skipUnless(AT_LEAST_17 and connection.vendor in ('postgresql', 'sqlite'), "Requires the indexes created on migration")
+class IndexUsageTest(IndexUsageTestMixin, TestCase):
+    """
+    Checks that the queries for the usual query time restrictions and joins find the rows using the indexes
+    created by the post_migrate handler in versions_tests.apps.VersionsTestsConfig.ready.
+    """
+
+    def setUp(self):
+        for i in range(10):
+            team = Team.objects.create(name='team %s' % i)
+            award = Award.objects.create(name='award %s' % i)
+            for j in range(10):
+                player = Player.objects.create(name='player %s.%s' % (i, j), team=team)
+                award.players.add(player)
+                player.clone()
+            team.clone()
+        self.t1 = get_utc_now()
+        Player.objects.current.first().clone()
+        self.team = Team.objects.current.first()
+        self.player = Player.objects.current.filter(team__identity=self.team.identity).first()
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    def test_current(self):
+        self.assertNoFullScans(Player.objects.current.filter(identity=self.player.identity))
+        self.assertNoFullScans(Player.objects.current.filter(team__identity=self.team.identity))
+        self.assertNoFullScans(Team.objects.current.filter(player__identity=self.player.identity))
+        self.assertNoFullScans(Award.objects.current.filter(players__identity=self.player.identity))
+
+    def test_as_of(self):
+        self.assertNoFullScans(Player.objects.as_of(self.t1).filter(identity=self.player.identity))
+        self.assertNoFullScans(Player.objects.as_of(self.t1).filter(team__identity=self.team.identity))
+        self.assertNoFullScans(Award.objects.as_of(self.t1).filter(players__identity=self.player.identity))
+
+    def test_full_scans(self):
+        self.assertEqual(['versions_tests_player'], full_scans(Player.objects.current.filter(name='player 1.1')))
+        with self.assertRaises(AssertionError):
+            self.assertNoFullScans(Player.objects.current.filter(name='player 1.1'))